@@ -0,0 +1,6 @@
+#Mg-Nd reduction and hydride precipitation thermodynamics
+#Munro Alley 2025
+#Importing the package only pulls in numpy, the data is loaded on first use and matplotlib only by the plots module
+
+from .solvers import calc_delta_G, calc_eq_comp, calc_hyd_delta_G, calc_hyd_eq_comp, find_root
+from .thermo import ThermoDatabase, calc_X_Nd_Mg3Nd, get_database, set_database
@@ -0,0 +1,198 @@
+import numpy as np
+
+from . import analyses
+from .solvers import calc_delta_G, calc_hyd_delta_G, calc_hyd_eq_comp
+from .thermo import calc_X_Nd_Mg3Nd, get_database, liquidus_breaks
+
+#ADAPTIVE GRIDS
+#Non-uniform grids for the sweeps, with points only where the curves need them instead of the fixed uniform grids
+#Starting from a coarse grid, each interval's midpoint is evaluated and the interval is split when the midpoint is further
+#than atol + rtol * |y| from the straight line between its ends, i.e. when linear interpolation (how the curves are
+#plotted and read back from exports) would be off by more than the tolerance there
+#All midpoints of one refinement level are evaluated in one vectorized call, for every temperature row at once,
+#and the rows share one grid so results have the same layout as the uniform sweeps
+#The midpoint deviation of an interval is kept as the error bound of its two halves, which for smooth curves is
+#conservative (a half interval is off by about a quarter of that); the bounds come back as 'error', one per interval
+#Known kinks, like the activity data points where gamma is piecewise linear, are always grid points
+#Pressures are refined on a log scale by default, so the steep hydride X Nd at low P_H2 gets its points
+#    hydride = adaptive_hydride([700, 750, 800])
+#    hydride['P_H2'], hydride['X_Nd_eq_hyd_nonideal'], hydride['error'], hydride['evaluations']
+
+#Default tolerances, (atol, rtol) per family
+tolerances = {
+    'activity': (1e-4, 0),
+    'delta_G': (10, 1e-4),
+    'hyd_delta_G': (10, 1e-4),
+    'hydride': (1e-5, 1e-4),
+    'liquidus': (1e-5, 0),
+}
+
+#Adaptive grid for func over [x_low, x_high]; func takes a 1-D array of x and returns (n,) or (rows, n) values
+#Returns x, the values on it, the error bound of each interval (n - 1), the number of x func was evaluated at,
+#and whether every interval met the tolerance before max_points (or min_width) stopped it
+#With value_range (low, high) the deviation is measured on the values clipped to that range, so stretches where every
+#row is out of it (e.g. X Nd past 1) aren't refined; the values themselves are returned unclipped
+def refine(func, x_low, x_high, atol, rtol=0, n_initial=17, max_points=100000, min_width=1e-12, scale='linear', breakpoints=(),
+           value_range=None):
+    if scale == 'log':
+        forward, inverse = np.log, np.exp
+    elif scale == 'linear':
+        forward, inverse = (lambda x: x), (lambda u: u)
+    else:
+        raise ValueError(f"scale must be 'linear' or 'log', not {scale!r}")
+
+    u = np.linspace(forward(x_low), forward(x_high), n_initial)
+    breakpoints = np.asarray(breakpoints, dtype=float)
+    breakpoints = breakpoints[(breakpoints > x_low) & (breakpoints < x_high)]
+    u = np.unique(np.concatenate([u, forward(breakpoints)]))
+    if value_range is None:
+        clip = lambda values: values
+    else:
+        clip = lambda values: np.clip(values, *value_range)
+    y = np.atleast_2d(func(inverse(u)))
+    evaluations = len(u)
+    #Error bound of each interval, unknown until its midpoint has been looked at
+    error = np.full(len(u) - 1, np.inf)
+    active = np.arange(len(u) - 1)
+
+    while len(active) and len(u) + len(active) <= max_points:
+        u_mid = 0.5 * (u[active] + u[active + 1])
+        y_mid = np.atleast_2d(func(inverse(u_mid)))
+        evaluations += len(u_mid)
+        with np.errstate(invalid='ignore'):
+            deviation = np.abs(clip(y_mid) - 0.5 * (clip(y[:, active]) + clip(y[:, active + 1])))
+            excess = np.where(np.isfinite(deviation), deviation - (atol + rtol * np.abs(clip(y_mid))), np.inf)
+        deviation = np.max(np.where(np.isfinite(deviation), deviation, np.inf), axis=0)
+        split = np.max(excess, axis=0) > 0
+        #Intervals as narrow as min_width are not split again, whatever their deviation
+        split &= inverse(u[active + 1]) - inverse(u[active]) > 2 * min_width
+
+        #Every evaluated midpoint goes into the grid, both halves get the parent's deviation as their bound
+        #Each point starts the interval to its right, so the errors are sorted along with the points
+        #(the last point, x_high, starts none and stays last)
+        error[active] = deviation
+        order = np.argsort(np.concatenate([u, u_mid]), kind='stable')
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        u = np.concatenate([u, u_mid])[order]
+        y = np.concatenate([y, y_mid], axis=1)[:, order]
+        error = np.concatenate([error, [np.nan], deviation])[order][:-1]
+        left = position[active]
+        active = np.sort(np.concatenate([left[split], left[split] + 1]))
+
+    converged = not len(active) and bool(np.all(np.isfinite(error)))
+    return {'x': inverse(u), 'y': y, 'error': error, 'evaluations': evaluations, 'converged': converged}
+
+#Splits the stacked rows of a refine result back into named (n_T, n) arrays
+def _unstack(grid, names, n_T):
+    return {name: grid['y'][i * n_T:(i + 1) * n_T] for i, name in enumerate(names)}
+
+def _result(grid, grid_name, temps, names):
+    return {
+        'T': temps,
+        grid_name: grid['x'],
+        **_unstack(grid, names, len(temps)),
+        'error': grid['error'],
+        'evaluations': grid['evaluations'],
+        'converged': grid['converged'],
+    }
+
+#calc_activity_curves on an adaptive X Nd grid, error in activity / activity coefficient
+def adaptive_activity(temps, atol=None, rtol=None, max_points=100000, db=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    T = temps[:, np.newaxis]
+    atol = tolerances['activity'][0] if atol is None else atol
+    rtol = tolerances['activity'][1] if rtol is None else rtol
+
+    def func(X_Nd):
+        return np.concatenate([db.gamma(T, X_Nd, 'Nd'), db.gamma(T, X_Nd, 'Mg'), db.activity(T, X_Nd, 'Nd'), db.activity(T, X_Nd, 'Mg')])
+
+    grid = refine(func, analyses.X_Nd_smooth[0], analyses.X_Nd_smooth[-1], atol, rtol, max_points=max_points, breakpoints=db.X_Nd_data)
+    results = analyses.calc_activity_curves(temps, db)
+    results.update(_result(grid, 'X_Nd', temps, ('gamma_Nd', 'gamma_Mg', 'a_Nd', 'a_Mg')))
+    return results
+
+#calc_delta_G_curves on an adaptive X Nd grid, error in J/mol
+def adaptive_delta_G_curves(temps, atol=None, rtol=None, max_points=100000, db=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    T = temps[:, np.newaxis]
+    Gf_MgO = db.Gf(T, 'Gf_MgO')
+    Gf_Nd2O3 = db.Gf(T, 'Gf_Nd2O3')
+    Gf_NdL = db.Gf(T, 'Gf_NdL')
+    atol = tolerances['delta_G'][0] if atol is None else atol
+    rtol = tolerances['delta_G'][1] if rtol is None else rtol
+
+    def func(X_Nd):
+        return np.concatenate([calc_delta_G(X_Nd, 'true', Gf_MgO, Gf_Nd2O3, Gf_NdL, T, db),
+                               calc_delta_G(X_Nd, 'false', Gf_MgO, Gf_Nd2O3, Gf_NdL, T, db)])
+
+    grid = refine(func, analyses.X_Nd_range[0], analyses.X_Nd_range[-1], atol, rtol, max_points=max_points, breakpoints=db.X_Nd_data)
+    return _result(grid, 'X_Nd', temps, ('delta_G_ideal', 'delta_G_nonideal'))
+
+#calc_hyd_delta_G_curves on an adaptive X Nd grid, error in J/mol
+def adaptive_hyd_delta_G_curves(temps, atol=None, rtol=None, max_points=100000, db=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    T = temps[:, np.newaxis]
+    Gf_NdH2 = db.Gf(T, 'Gf_NdH2')
+    Gf_NdL = db.Gf(T, 'Gf_NdL')
+    atol = tolerances['hyd_delta_G'][0] if atol is None else atol
+    rtol = tolerances['hyd_delta_G'][1] if rtol is None else rtol
+
+    def func(X_Nd):
+        return np.concatenate([calc_hyd_delta_G(X_Nd, 'true', Gf_NdH2, Gf_NdL, T, db),
+                               calc_hyd_delta_G(X_Nd, 'false', Gf_NdH2, Gf_NdL, T, db)])
+
+    grid = refine(func, analyses.X_Nd_range[0], analyses.X_Nd_range[-1], atol, rtol, max_points=max_points, breakpoints=db.X_Nd_data)
+    return _result(grid, 'X_Nd', temps, ('hyd_delta_G_ideal', 'hyd_delta_G_nonideal'))
+
+#calc_hydride on an adaptive P_H2 grid (log scale unless scale='linear'), error in X Nd
+#Only X Nd in [0, 1] is refined: at low P_H2 the ideal (and high T nonideal) X Nd runs far past 1, where there is no melt to
+#resolve, so the error there is the error of the curve clipped to 1
+#The nonideal X Nd has kinks where it passes an activity data point, and the clipped curves where they reach 1;
+#an interval holding one of those can be off by up to about 1.3 times its bound
+def adaptive_hydride(temps, P_low=None, P_high=None, atol=None, rtol=None, max_points=100000, scale='log', db=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    Gf_NdH2 = db.Gf(temps, 'Gf_NdH2')
+    Gf_NdL = db.Gf(temps, 'Gf_NdL')
+    P_low = analyses.P_H2_range[0] if P_low is None else P_low
+    P_high = analyses.P_H2_range[-1] if P_high is None else P_high
+    atol = tolerances['hydride'][0] if atol is None else atol
+    rtol = tolerances['hydride'][1] if rtol is None else rtol
+
+    def func(P_H2):
+        return np.concatenate([calc_hyd_eq_comp('true', Gf_NdH2, Gf_NdL, temps, P_H2, db),
+                               calc_hyd_eq_comp('false', Gf_NdH2, Gf_NdL, temps, P_H2, db)])
+
+    grid = refine(func, P_low, P_high, atol, rtol, max_points=max_points, scale=scale, value_range=(0, 1))
+    return _result(grid, 'P_H2', temps, ('X_Nd_eq_hyd_ideal', 'X_Nd_eq_hyd_nonideal'))
+
+#calc_liquidus_curve on an adaptive T grid, error in X Nd
+#The liquidus data points are always grid points, so the curve goes through them, and so are the joins between the
+#spline's quadratic pieces, so no interval straddles one
+def adaptive_liquidus(atol=None, rtol=None, max_points=100000, db=None):
+    atol = tolerances['liquidus'][0] if atol is None else atol
+    rtol = tolerances['liquidus'][1] if rtol is None else rtol
+    grid = refine(lambda T: calc_X_Nd_Mg3Nd(T, db), analyses.T_Mg3Nd_smooth[0], analyses.T_Mg3Nd_smooth[-1], atol, rtol,
+                  max_points=max_points, breakpoints=liquidus_breaks(db))
+    results = analyses.calc_liquidus_curve(db)
+    results.update({'T': grid['x'], 'X_Nd': grid['y'][0], 'error': grid['error'],
+                    'evaluations': grid['evaluations'], 'converged': grid['converged']})
+    return results
+
+#Adaptive versions of the curve families in calc_all, for plots and exports
+def calc_adaptive_all(temps, P_low=None, P_high=None, db=None):
+    return {
+        'activity': adaptive_activity(temps, db=db),
+        'liquidus': adaptive_liquidus(db=db),
+        'delta_G': adaptive_delta_G_curves(temps, db=db),
+        'hyd_delta_G': adaptive_hyd_delta_G_curves(temps, db=db),
+        'hydride': adaptive_hydride(temps, P_low, P_high, db=db),
+    }
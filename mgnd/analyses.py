@@ -0,0 +1,161 @@
+import numpy as np
+
+from .cache import cached_rows
+from .solvers import calc_delta_G, calc_eq_comp, calc_hyd_delta_G, calc_hyd_eq_comp
+from .thermo import calc_X_Nd_Mg3Nd, get_database, liquidus_points
+
+#ANALYSES
+#Each analysis returns a dictionary of arrays for the requested temperatures (degrees C), one row per temperature
+#The equilibrium sweeps take an optional ResultCache so repeat runs only solve temperatures they haven't seen
+#Nothing here imports matplotlib, the plots module draws these results
+
+#Default grids, same as the manuscript figures
+X_Nd_smooth = np.linspace(0, 1, 201)
+X_Nd_range = np.linspace(0.000001, 0.999999, 1000)
+P_H2_range = np.linspace(0.000001, 1.1, 1100)
+Nd2O3_i = np.linspace(0, 1, 1001)
+T_Mg3Nd_smooth = np.linspace(640, 779.93967, 100)
+
+#Solver settings for the reduction equilibrium
+precision = 0.000001
+iterations = 100
+
+#Interpolated activity and activity coefficient curves, plus the values at the activity data points
+def calc_activity_curves(temps, db=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    T = temps[:, np.newaxis]
+
+    gamma_Nd_data, _ = db.gamma_table(temps, 'Nd')
+    gamma_Mg_data, _ = db.gamma_table(temps, 'Mg')
+
+    return {
+        'T': temps,
+        'X_Nd': X_Nd_smooth,
+        'gamma_Nd': db.gamma(T, X_Nd_smooth, 'Nd'),
+        'gamma_Mg': db.gamma(T, X_Nd_smooth, 'Mg'),
+        'a_Nd': db.activity(T, X_Nd_smooth, 'Nd'),
+        'a_Mg': db.activity(T, X_Nd_smooth, 'Mg'),
+        'X_Nd_data': db.X_Nd_data,
+        'gamma_Nd_data': gamma_Nd_data,
+        'gamma_Mg_data': gamma_Mg_data,
+        'a_Nd_data': db.X_Nd_data * gamma_Nd_data,
+        'a_Mg_data': db.X_Mg_data * gamma_Mg_data,
+    }
+
+#Mg3Nd liquidus, X Nd where Mg3Nd forms as f(T)
+def calc_liquidus_curve(db=None):
+    T_data, X_Nd_data = liquidus_points(db)
+    return {
+        'T': T_Mg3Nd_smooth,
+        'X_Nd': calc_X_Nd_Mg3Nd(T_Mg3Nd_smooth, db),
+        'T_data': np.asarray(T_data),
+        'X_Nd_data': np.asarray(X_Nd_data),
+    }
+
+#Equilibrium reduction composition for both ideal and non-ideal Mg-Nd solution, all temperatures in one go
+def calc_reduction(temps, db=None, cache=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+
+    def compute(temps):
+        Gf_MgO = db.Gf(temps, 'Gf_MgO')
+        Gf_Nd2O3 = db.Gf(temps, 'Gf_Nd2O3')
+        Gf_NdL = db.Gf(temps, 'Gf_NdL')
+        X_Nd_eq_ideal, converged_ideal = calc_eq_comp('true', Gf_MgO, Gf_Nd2O3, Gf_NdL, temps, iterations, precision, db)
+        X_Nd_eq_nonideal, converged_nonideal = calc_eq_comp('false', Gf_MgO, Gf_Nd2O3, Gf_NdL, temps, iterations, precision, db)
+        return {
+            'X_Nd_eq_ideal': X_Nd_eq_ideal,
+            'X_Nd_eq_nonideal': X_Nd_eq_nonideal,
+            'converged_ideal': converged_ideal,
+            'converged_nonideal': converged_nonideal,
+        }
+
+    if cache is None:
+        results = compute(temps)
+    else:
+        results = cached_rows(cache, temps, ('reduction', db.fingerprint(), precision, iterations), compute)
+    return {'T': temps, **results}
+
+#Reduction delta G as a function of X Nd
+def calc_delta_G_curves(temps, X_Nd=X_Nd_range, db=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    X_Nd = np.asarray(X_Nd, dtype=float)
+    T = temps[:, np.newaxis]
+    Gf_MgO = db.Gf(T, 'Gf_MgO')
+    Gf_Nd2O3 = db.Gf(T, 'Gf_Nd2O3')
+    Gf_NdL = db.Gf(T, 'Gf_NdL')
+
+    return {
+        'T': temps,
+        'X_Nd': X_Nd,
+        'delta_G_ideal': calc_delta_G(X_Nd, 'true', Gf_MgO, Gf_Nd2O3, Gf_NdL, T, db),
+        'delta_G_nonideal': calc_delta_G(X_Nd, 'false', Gf_MgO, Gf_Nd2O3, Gf_NdL, T, db),
+    }
+
+#X Nd at full reduction for fractions of the stoichiometric Nd2O3:Mg ratio (3 mol Mg)
+def calc_reactant_ratio():
+    Mg_i = 3
+    X_Nd_full_red = (2 * Nd2O3_i) / ((2 * Nd2O3_i) + (Mg_i - (3 * Nd2O3_i)))
+    return {
+        'Nd2O3_i': Nd2O3_i,
+        'X_Nd_full_red': X_Nd_full_red,
+    }
+
+#Hydride precipitation delta G as a function of X Nd
+def calc_hyd_delta_G_curves(temps, X_Nd=X_Nd_range, db=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    X_Nd = np.asarray(X_Nd, dtype=float)
+    T = temps[:, np.newaxis]
+    Gf_NdH2 = db.Gf(T, 'Gf_NdH2')
+    Gf_NdL = db.Gf(T, 'Gf_NdL')
+
+    return {
+        'T': temps,
+        'X_Nd': X_Nd,
+        'hyd_delta_G_ideal': calc_hyd_delta_G(X_Nd, 'true', Gf_NdH2, Gf_NdL, T, db),
+        'hyd_delta_G_nonideal': calc_hyd_delta_G(X_Nd, 'false', Gf_NdH2, Gf_NdL, T, db),
+    }
+
+#Equilibrium hydriding X Nd over the (T, P_H2) grid
+def calc_hydride(temps, P_H2=P_H2_range, db=None, cache=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    P_H2 = np.asarray(P_H2, dtype=float)
+
+    def compute(temps):
+        Gf_NdH2 = db.Gf(temps, 'Gf_NdH2')
+        Gf_NdL = db.Gf(temps, 'Gf_NdL')
+        return {
+            'X_Nd_eq_hyd_ideal': calc_hyd_eq_comp('true', Gf_NdH2, Gf_NdL, temps, P_H2, db),
+            'X_Nd_eq_hyd_nonideal': calc_hyd_eq_comp('false', Gf_NdH2, Gf_NdL, temps, P_H2, db),
+        }
+
+    if cache is None:
+        results = compute(temps)
+    else:
+        results = cached_rows(cache, temps, ('hydride', db.fingerprint(), P_H2), compute)
+    return {'T': temps, 'P_H2': P_H2, **results}
+
+#Every result family used by the manuscript figures, keyed by family name
+#T_fine adds a 'reduction_fine' family for the continuous equilibrium composition vs. temperature curve
+def calc_all(temps, T_fine=None, db=None, cache=None):
+    results = {
+        'activity': calc_activity_curves(temps, db),
+        'liquidus': calc_liquidus_curve(db),
+        'reduction': calc_reduction(temps, db, cache),
+        'delta_G': calc_delta_G_curves(temps, db=db),
+        'reactant_ratio': calc_reactant_ratio(),
+        'hyd_delta_G': calc_hyd_delta_G_curves(temps, db=db),
+        'hydride': calc_hydride(temps, db=db, cache=cache),
+    }
+    if T_fine is not None:
+        results['reduction_fine'] = calc_reduction(T_fine, db, cache)
+    return results
@@ -0,0 +1,231 @@
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import analyses
+from .solvers import calc_delta_G, calc_eq_comp, calc_hyd_eq_comp
+from .thermo import get_database
+
+#BENCHMARKS AND REGRESSION CHECKS
+#Times each calculation stage over growing grids and appends throughput and peak memory to a JSON lines history file
+#Checks the solvers against golden reference arrays, so speed-ups can't quietly change the thermodynamics
+#The golden arrays are golden.npz next to this file, made once from the original Manuscript Code.py (baseline commit):
+#its data, interpolation and step-and-shrink solvers on its own temperatures, X Nd range and 1100 pressures
+#That script's solvers read the gamma interpolated last (850 C) at every temperature, so they were rerun with each
+#temperature's own gamma, and the hydride precision was tightened to 1e-12 in a Nd
+#A recomputation with the ported solvers below (slow, one point at a time) is only done when asked for
+#    python -m mgnd bench --history benchmarks.jsonl
+#    python -m mgnd bench --check-only
+#    python -m mgnd bench --check-only --recompute-golden
+
+#Grid sizes for the scaling runs, temperatures are scaled with the default grids and pressures at scaling_temps temperatures
+temperature_scales = (10, 100, 1000, 10000)
+pressure_scales = (1000, 10000, 100000, 1000000)
+scaling_temps = 10
+
+#Tolerances for the golden comparison, X Nd in mole fraction and delta G in J/mol
+golden_atol = {'X_Nd': 1e-6, 'delta_G': 1e-6}
+
+golden_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.npz')
+
+#ORIGINAL SOLVERS
+#Step-and-shrink searches from the manuscript, kept as an independent reference: X Nd goes up in steps of increment
+#until the target is overshot, then steps back and the increment shrinks tenfold
+#gamma comes from the database at the same T, so they differ from the vectorized solvers only in the root finding
+
+def reference_eq_comp(is_ideal, Gf_MgO, Gf_Nd2O3, Gf_NdL, T, iterations=10000, increment=0.001, precision=0.000001, db=None):
+    X_Nd_guess = increment
+    eq_comp = np.nan
+    for i in range(iterations):
+        delta_G_guess = calc_delta_G(X_Nd_guess, is_ideal, Gf_MgO, Gf_Nd2O3, Gf_NdL, T, db)
+        if delta_G_guess < 0:
+            X_Nd_guess += increment
+        elif delta_G_guess > precision:
+            X_Nd_guess -= increment
+            increment = increment / 10
+        else:
+            eq_comp = X_Nd_guess
+            break
+    return eq_comp
+
+def reference_hyd_eq_comp(is_ideal, Gf_NdH2, Gf_NdL, T, P_H2, iterations=10000, increment=0.001, precision=0.0000001, db=None):
+    if db is None:
+        db = get_database()
+    a_Nd = (np.exp((Gf_NdH2 - Gf_NdL) / (8.314 * (T + 273.15)))) / P_H2
+    if is_ideal == 'true' or a_Nd > 1:
+        return a_Nd
+    X_Nd_guess = precision
+    hyd_eq_comp = np.nan
+    for i in range(iterations):
+        a_Nd_dif = X_Nd_guess * db.gamma(T, X_Nd_guess, 'Nd') - a_Nd
+        if a_Nd_dif < 0:
+            X_Nd_guess += increment
+        elif a_Nd_dif > precision:
+            X_Nd_guess -= increment
+            increment = increment / 10
+        else:
+            hyd_eq_comp = X_Nd_guess
+            break
+    return hyd_eq_comp
+
+#GOLDEN ARRAYS
+#Reference arrays recomputed with the ported solvers at the database temperatures, with the current database
+#The hydride curves use every 50th manuscript pressure, since the reference solves one point at a time
+#The original hydride precision (1e-7 in a Nd) only pins X Nd to ~1e-5 where gamma Nd is small, so it is tightened here
+def golden_arrays(db=None):
+    if db is None:
+        db = get_database()
+    temps = db.temps
+    P_H2 = analyses.P_H2_range[::50]
+    golden = {'T': temps, 'P_H2': P_H2, 'X_Nd': analyses.X_Nd_range}
+    for is_ideal, suffix in (('true', 'ideal'), ('false', 'nonideal')):
+        golden[f'X_Nd_eq_{suffix}'] = np.array([
+            reference_eq_comp(is_ideal, db.Gf(T, 'Gf_MgO'), db.Gf(T, 'Gf_Nd2O3'), db.Gf(T, 'Gf_NdL'), T, db=db) for T in temps])
+        golden[f'X_Nd_eq_hyd_{suffix}'] = np.array([
+            [reference_hyd_eq_comp(is_ideal, db.Gf(T, 'Gf_NdH2'), db.Gf(T, 'Gf_NdL'), T, P, precision=1e-12, db=db) for P in P_H2] for T in temps])
+        #delta G has no solver, so the golden curves are the direct point by point evaluation
+        golden[f'delta_G_{suffix}'] = np.array([
+            calc_delta_G(analyses.X_Nd_range, is_ideal, db.Gf(T, 'Gf_MgO'), db.Gf(T, 'Gf_Nd2O3'), db.Gf(T, 'Gf_NdL'), T, db) for T in temps])
+    return golden
+
+def save_golden(path, db=None):
+    np.savez(path, **golden_arrays(db))
+
+#Compares the current solvers with the golden arrays (from path, or recomputed by golden_arrays when recompute is set)
+#Returns one dict per compared array with the largest absolute difference, its tolerance and whether it passed
+def check_golden(path=golden_path, db=None, recompute=False):
+    if db is None:
+        db = get_database()
+    if recompute:
+        golden = golden_arrays(db)
+    else:
+        with np.load(path) as stored:
+            golden = {name: stored[name] for name in stored.files}
+
+    temps = golden['T']
+    reduction = analyses.calc_reduction(temps, db)
+    hydride = analyses.calc_hydride(temps, golden['P_H2'], db)
+    delta_G = analyses.calc_delta_G_curves(temps, golden['X_Nd'], db)
+    current = {**reduction, **hydride, **delta_G}
+
+    checks = []
+    for name in ('X_Nd_eq_ideal', 'X_Nd_eq_nonideal', 'X_Nd_eq_hyd_ideal', 'X_Nd_eq_hyd_nonideal', 'delta_G_ideal', 'delta_G_nonideal'):
+        atol = golden_atol['delta_G' if name.startswith('delta_G') else 'X_Nd']
+        #Relative to the value as well, the ideal hydride X Nd runs into the thousands at low P_H2
+        difference = np.abs(current[name] - golden[name])
+        allowed = atol + 1e-9 * np.abs(golden[name])
+        checks.append({
+            'name': name,
+            'max_abs_diff': float(np.nanmax(difference)),
+            'atol': atol,
+            'passed': bool(np.all((difference <= allowed) | (np.isnan(current[name]) & np.isnan(golden[name])))),
+        })
+    return checks
+
+#TIMING
+#Each stage is set up once and returns (number of points, function to time)
+def _stage_activity(temps, db):
+    X_Nd = analyses.X_Nd_smooth
+    T = temps[:, np.newaxis]
+    return len(temps) * len(X_Nd), lambda: (db.gamma(T, X_Nd, 'Nd'), db.gamma(T, X_Nd, 'Mg'))
+
+def _stage_delta_G(temps, db):
+    X_Nd = analyses.X_Nd_range
+    T = temps[:, np.newaxis]
+    Gf = [db.Gf(T, name) for name in ('Gf_MgO', 'Gf_Nd2O3', 'Gf_NdL')]
+    return len(temps) * len(X_Nd), lambda: calc_delta_G(X_Nd, 'false', *Gf, T, db)
+
+def _stage_reduction(temps, db):
+    Gf = [db.Gf(temps, name) for name in ('Gf_MgO', 'Gf_Nd2O3', 'Gf_NdL')]
+    return len(temps), lambda: calc_eq_comp('false', *Gf, temps, analyses.iterations, analyses.precision, db)
+
+def _stage_hydride(temps, db, P_H2=analyses.P_H2_range):
+    Gf_NdH2 = db.Gf(temps, 'Gf_NdH2')
+    Gf_NdL = db.Gf(temps, 'Gf_NdL')
+    return len(temps) * len(P_H2), lambda: calc_hyd_eq_comp('false', Gf_NdH2, Gf_NdL, temps, P_H2, db)
+
+stages = {
+    'activity': _stage_activity,
+    'delta_G': _stage_delta_G,
+    'reduction': _stage_reduction,
+    'hydride': _stage_hydride,
+}
+
+#Best wall time of repeat runs, then one more run under tracemalloc for the peak memory (tracemalloc slows it down)
+def time_call(func, repeat=3):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+#(stage, n_T, n_P) for every scaling run, n_P is None for the stages without a pressure grid
+def scaling_runs(max_temps=None, max_pressures=None):
+    runs = []
+    for n_T in temperature_scales:
+        if max_temps is None or n_T <= max_temps:
+            runs.extend((stage, n_T, len(analyses.P_H2_range) if stage == 'hydride' else None) for stage in stages)
+    for n_P in pressure_scales:
+        if max_pressures is None or n_P <= max_pressures:
+            runs.append(('hydride', scaling_temps, n_P))
+    return runs
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+#Runs every scaling run and returns one record per run, appending them to history_path (JSON lines) when given
+def run_benchmarks(history_path=None, max_temps=None, max_pressures=None, repeat=3, db=None):
+    if db is None:
+        db = get_database()
+    common = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+    }
+    records = []
+    for stage, n_T, n_P in scaling_runs(max_temps, max_pressures):
+        temps = np.linspace(650, 850, n_T)
+        if n_P is None:
+            points, func = stages[stage](temps, db)
+        else:
+            points, func = stages[stage](temps, db, np.linspace(0.000001, 1.1, n_P))
+        seconds, peak = time_call(func, repeat)
+        records.append({**common, 'stage': stage, 'n_T': n_T, 'n_P': n_P, 'points': points,
+                        'seconds': seconds, 'points_per_second': points / seconds, 'peak_bytes': peak})
+
+    if history_path is not None:
+        with open(history_path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+    return records
+
+#Latest earlier record for each (stage, n_T, n_P) in a history file, to compare a new run against
+def last_records(history_path):
+    last = {}
+    try:
+        with open(history_path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    last[(record['stage'], record['n_T'], record['n_P'])] = record
+    except OSError:
+        pass
+    return last
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+#RESULT CACHE
+#Content addressed on-disk cache for sweep results, one uncompressed .npz file per temperature row
+#Keys hash the thermodynamic data (ThermoDatabase.fingerprint), the solver settings and the sweep grid,
+#so changing any input just misses, and a sweep over new temperatures only solves the temperatures not stored yet
+#Least recently used entries are deleted once the folder is over max_bytes
+
+#Feeds nested dicts/tuples/lists of arrays and scalars into a hashlib object, including dtype and shape
+#None, bools, ints and floats are hashed by value with their type; anything else has to be a numeric array,
+#object arrays (and other objects) would only hash their memory addresses, so they raise ValueError
+def hash_value(h, value):
+    if isinstance(value, dict):
+        for key in sorted(value):
+            h.update(str(key).encode())
+            hash_value(h, value[key])
+    elif isinstance(value, (tuple, list)):
+        h.update(b'(')
+        for item in value:
+            hash_value(h, item)
+        h.update(b')')
+    elif isinstance(value, str):
+        h.update(value.encode())
+    elif value is None:
+        h.update(b'None')
+    elif isinstance(value, bool):
+        h.update(f'bool:{value}'.encode())
+    elif isinstance(value, int):
+        h.update(f'int:{value}'.encode())
+    elif isinstance(value, float):
+        h.update(f'float:{float(value).hex()}'.encode())
+    else:
+        array = np.ascontiguousarray(value)
+        if array.dtype.hasobject:
+            raise ValueError(f"can't make a cache key from {type(value).__name__} {value!r:.60}, only from numbers, strings, None and numeric arrays")
+        h.update(f'{array.dtype}{array.shape}'.encode())
+        h.update(array.tobytes())
+
+def make_key(*parts):
+    h = hashlib.sha256()
+    hash_value(h, parts)
+    return h.hexdigest()
+
+class ResultCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024**2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.npz')
+
+    def _entries(self):
+        for folder in os.scandir(self.cache_dir):
+            if folder.is_dir():
+                for entry in os.scandir(folder.path):
+                    if entry.name.endswith('.npz'):
+                        yield entry
+
+    #Total size of the cache, counted once and then kept up to date by put and evict
+    def size(self):
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in self._entries())
+        return self._size
+
+    #Dict of arrays stored under key, or None; a hit marks the entry as recently used
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path) as stored:
+                arrays = {name: stored[name] for name in stored.files}
+        except (OSError, ValueError, EOFError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def put(self, key, arrays):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        #Written to a temporary file first so other processes never read half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        self._size = self.size() + os.path.getsize(path) - old_size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    #Deletes least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        entries = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries()))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._size = total
+
+    def clear(self):
+        for entry in list(self._entries()):
+            os.remove(entry.path)
+        self._size = 0
+
+#Runs a sweep over temps through the cache, one entry per temperature
+#compute(missing_temps) has to return a dict of arrays with one row per temperature
+#key_parts identify everything else the rows depend on (analysis name, data fingerprint, solver settings, grids)
+def cached_rows(cache, temps, key_parts, compute):
+    temps = np.asarray(temps, dtype=float)
+    if len(temps) == 0:
+        return compute(temps)
+    keys = [make_key(key_parts, T) for T in temps]
+    rows = [cache.get(key) for key in keys]
+
+    missing = [i for i, stored in enumerate(rows) if stored is None]
+    if missing:
+        computed = compute(temps[missing])
+        for n, i in enumerate(missing):
+            rows[i] = {name: values[n] for name, values in computed.items()}
+            cache.put(keys[i], rows[i])
+
+    return {name: np.array([row[name] for row in rows]) for name in rows[0]}
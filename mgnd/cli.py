@@ -0,0 +1,392 @@
+import argparse
+import json
+import math
+import sys
+from contextlib import nullcontext
+
+import numpy as np
+
+from . import analyses
+from .thermo import calc_X_Nd_Mg3Nd, get_database
+
+#COMMAND LINE
+#Runs only the requested analysis for the requested temperatures, e.g.
+#    python -m mgnd reduction -T 650 700.5 750
+#    python -m mgnd hydride -T 700 -P 0.1 0.5 1.0 --json
+#    python -m mgnd delta-g -T 850 -X 0.1 0.15 0.2 --hydride
+#    python -m mgnd render -o figures --formats png pdf --workers 4
+#    python -m mgnd export -o exports --formats csv parquet -P 0.0001 0.001 0.01
+#    python -m mgnd export -o exports --adaptive
+#    python -m mgnd uncertainty -T 700 800 -n 100000 --seed 1
+#    python -m mgnd design -r 0.95 -P 0 0.1 0.5 1.0
+#    python -m mgnd bench --history benchmarks.jsonl --max-temps 1000
+#    python -m mgnd --telemetry telemetry.json --live reduction -T 650 700 750
+#    python -m mgnd tables -o delta_G_tables
+#    python -m mgnd store -o MgNd_store
+#    python -m mgnd --store MgNd_store reduction -T 700
+#    python -m mgnd serve --port 8750
+#    python -m mgnd phasemap -P 0.01 0.05 0.1 1 -o process_map.json
+#    python -m mgnd simulate -f 0.1 0.3 --times 0 3600 7200 -T 700 800 800 -P 0 0 0.5 --t-end 7200
+#matplotlib is only imported when --plot is given
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog='mgnd', description='Mg-Nd reduction and hydride equilibrium calculations')
+    parser.add_argument('--telemetry', help='record solver statistics and write them to this JSON file')
+    parser.add_argument('--live', action='store_true', help='print solver statistics to stderr every second while running')
+    parser.add_argument('--store', help='use the thermodynamic data in this data store folder instead of the built-in data')
+    subparsers = parser.add_subparsers(dest='analysis', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-T', '--temps', type=float, nargs='+', help='temperatures in degrees C (default: the tabulated temperatures)')
+    common.add_argument('--json', action='store_true', help='write JSON instead of a tab separated table')
+    common.add_argument('--plot', action='store_true', help='also show the figures for this analysis')
+    common.add_argument('--cache-dir', help='reuse equilibrium results stored in this folder and add new ones to it')
+
+    subparsers.add_parser('reduction', parents=[common], help='equilibrium X Nd for Nd2O3 reduction by Mg')
+
+    hydride = subparsers.add_parser('hydride', parents=[common], help='equilibrium X Nd for NdH2 precipitation')
+    hydride.add_argument('-P', '--pressures', type=float, nargs='+', help='H2 pressures (default: the manuscript 0-1.1 sweep)')
+
+    delta_G = subparsers.add_parser('delta-g', parents=[common], help='delta G as a function of X Nd')
+    delta_G.add_argument('-X', '--x-nd', type=float, nargs='+', help='X Nd values (default: the manuscript 0-1 sweep)')
+    delta_G.add_argument('--hydride', action='store_true', help='hydride precipitation instead of reduction')
+
+    render = subparsers.add_parser('render', help='write every figure to a folder without opening any windows')
+    render.add_argument('-T', '--temps', type=float, nargs='+', help='temperatures in degrees C (default: the tabulated temperatures)')
+    render.add_argument('-o', '--output-dir', default='figures', help='folder for the figures (default: figures)')
+    render.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'], help='file formats (default: png)')
+    render.add_argument('--workers', type=int, help='number of worker processes (default: one per CPU)')
+    render.add_argument('--dpi', type=int, default=150)
+    render.add_argument('--force', action='store_true', help='render every figure even if its inputs are unchanged')
+    render.add_argument('--cache-dir', help='reuse equilibrium results stored in this folder and add new ones to it')
+
+    export = subparsers.add_parser('export', help='write every result family as tidy long-format tables')
+    export.add_argument('-T', '--temps', type=float, nargs='+', help='temperatures in degrees C (default: the tabulated temperatures)')
+    export.add_argument('-P', '--pressures', type=float, nargs='+', help='H2 pressures for the hydride table (default: the manuscript 0-1.1 sweep)')
+    export.add_argument('-o', '--output-dir', default='exports', help='folder for the tables (default: exports)')
+    export.add_argument('--formats', nargs='+', default=['csv'], choices=['csv', 'parquet', 'xlsx'], help='file formats (default: csv)')
+    export.add_argument('--chunk-rows', type=int, default=250000, help='rows per streamed chunk')
+    export.add_argument('--cache-dir', help='reuse equilibrium results stored in this folder and add new ones to it')
+    export.add_argument('--adaptive', action='store_true', help='adaptive grids for the curve families (pressures between the lowest and highest -P)')
+
+    uncertainty = subparsers.add_parser('uncertainty', help='Monte Carlo confidence bands on the equilibrium X Nd')
+    uncertainty.add_argument('-T', '--temps', type=float, nargs='+', help='temperatures in degrees C (default: the tabulated temperatures)')
+    uncertainty.add_argument('-P', '--pressures', type=float, nargs='+', help='H2 pressures, gives hydride bands instead of reduction bands')
+    uncertainty.add_argument('-n', '--samples', type=int, default=10000, help='samples per temperature (default: 10000)')
+    uncertainty.add_argument('--ideal', action='store_true', help='ideal solution (no activity uncertainty)')
+    uncertainty.add_argument('--seed', type=int)
+    uncertainty.add_argument('--workers', type=int, help='number of worker processes (default: one per CPU)')
+    uncertainty.add_argument('--json', action='store_true', help='write JSON instead of a tab separated table')
+
+    design = subparsers.add_parser('design', help='largest Nd2O3 charge that reaches a target Nd recovery at each T and P_H2')
+    design.add_argument('-r', '--recovery', type=float, required=True, help='target fraction of the charged Nd recovered (0-1)')
+    design.add_argument('-T', '--temps', type=float, nargs='+', help='temperatures in degrees C (default: 650-850 in 1 C steps)')
+    design.add_argument('-P', '--pressures', type=float, nargs='+', default=[0], help='H2 pressures (default: 0, no hydride limit)')
+    design.add_argument('--margin', type=float, default=0, help='X Nd kept away from every limit')
+    design.add_argument('--ideal', action='store_true', help='ideal solution')
+    design.add_argument('--json', action='store_true', help='write JSON instead of a tab separated table')
+    design.add_argument('--cache-dir', help='reuse equilibrium results stored in this folder and add new ones to it')
+
+    bench = subparsers.add_parser('bench', help='time each stage over growing grids and check results against golden arrays')
+    bench.add_argument('--history', help='append the timings to this JSON lines file and compare with its last run')
+    bench.add_argument('--golden', help='golden arrays (.npz) to check against (default: mgnd/golden.npz, from the original manuscript code)')
+    bench.add_argument('--recompute-golden', action='store_true', help='check against arrays recomputed with the ported original solvers instead')
+    bench.add_argument('--write-golden', help='save arrays recomputed with the ported original solvers to this .npz and stop')
+    bench.add_argument('--check-only', action='store_true', help='only run the golden comparison')
+    bench.add_argument('--max-temps', type=int, help='largest temperature grid to time (default: 10000)')
+    bench.add_argument('--max-pressures', type=int, help='largest pressure grid to time (default: 1000000)')
+    bench.add_argument('--repeat', type=int, default=3, help='timed runs per case, the best is kept (default: 3)')
+
+    tables = subparsers.add_parser('tables', help='precompute memory-mapped delta G lookup tables')
+    tables.add_argument('-o', '--output-dir', default='delta_G_tables', help='folder for the tables (default: delta_G_tables)')
+    tables.add_argument('-T', '--temps', type=float, nargs='+', help='table temperatures in degrees C (default: 640-860 in 1 C steps)')
+
+    store = subparsers.add_parser('store', help='write a memory-mappable data store, from the built-in data or from ThermoCalc/HSC exports')
+    store.add_argument('-o', '--output-dir', required=True, help='folder for the store')
+    store.add_argument('--species', nargs=2, default=['Nd', 'Mg'], metavar=('SOLUTE', 'SOLVENT'))
+    store.add_argument('--thermocalc', help='ThermoCalc activity table (T, X(LIQUID,RE), ACR(RE), ACR(MG))')
+    store.add_argument('--hsc', help='HSC free energy table (T and one column per compound)')
+    store.add_argument('--hsc-column', nargs=2, action='append', default=[], metavar=('COLUMN', 'GF_NAME'), help="e.g. 'Nd(l)' Gf_NdL")
+    store.add_argument('--thermocalc-kelvin', dest='thermocalc_T_unit', action='store_const', const='K', default='K', help='ThermoCalc T in K (default)')
+    store.add_argument('--thermocalc-celsius', dest='thermocalc_T_unit', action='store_const', const='C', help='ThermoCalc T in degrees C')
+    store.add_argument('--hsc-joules', action='store_true', help='HSC values in J/mol instead of kJ/mol')
+    store.add_argument('--liquidus', help='intermetallic liquidus points (T in degrees C and solute X), needed for the Mg3Nd limits')
+
+    simulate = subparsers.add_parser('simulate', help='time stepping of reduction and hydride precipitation for one or more charges')
+    simulate.add_argument('-f', '--ratios', type=float, nargs='+', default=[0.1], help='Nd2O3 charges, mol Nd2O3 per 3 mol Mg (default: 0.1)')
+    simulate.add_argument('--times', type=float, nargs='+', default=[0], help='profile times in s, T and P_H2 are linear between them')
+    simulate.add_argument('-T', '--temps', type=float, nargs='+', default=[750], help='temperature at each profile time, degrees C (default: 750)')
+    simulate.add_argument('-P', '--pressures', type=float, nargs='+', default=[0], help='H2 pressure at each profile time (default: 0)')
+    simulate.add_argument('--t-end', type=float, default=3600, help='simulated time in s (default: 3600)')
+    simulate.add_argument('--every', type=float, default=60, help='time between output rows in s (default: 60)')
+    simulate.add_argument('--rtol', type=float, default=1e-6, help='relative tolerance of the adaptive time steps (default: 1e-6)')
+    simulate.add_argument('--ideal', action='store_true', help='ideal solution')
+
+    serve = subparsers.add_parser('serve', help='local HTTP/JSON service answering equilibrium queries')
+    serve.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    serve.add_argument('--port', type=int, default=8750, help='port to listen on (default: 8750)')
+    serve.add_argument('--workers', type=int, help='worker processes for big batches and sweeps (default: one per CPU)')
+    serve.add_argument('--cache-size', type=int, default=100000, help='answered queries kept in memory (default: 100000)')
+    serve.add_argument('--batch-window', type=float, default=0.001, help='seconds to gather queries into one solve (default: 0.001)')
+
+    phasemap = subparsers.add_parser('phasemap', help='trace the reduction, Mg3Nd and hydride boundaries and list where they cross')
+    phasemap.add_argument('-P', '--pressures', type=float, nargs='+', default=[0.01, 0.1, 1.0], help='H2 pressures to trace the hydride boundary at')
+    phasemap.add_argument('--T-range', type=float, nargs=2, metavar=('LOW', 'HIGH'), help='temperature range in degrees C (default: the tabulated range)')
+    phasemap.add_argument('--ideal', action='store_true', help='ideal solution')
+    phasemap.add_argument('-o', '--output', help='also write the traced curves and crossings to this JSON file')
+    phasemap.add_argument('--json', action='store_true', help='write JSON instead of a tab separated table')
+
+    return parser.parse_args(argv)
+
+#JSON has no NaN or infinity, those become null
+def _json_values(values):
+    if isinstance(values, dict):
+        return {name: _json_values(value) for name, value in values.items()}
+    if isinstance(values, list):
+        return [_json_values(value) for value in values]
+    return None if isinstance(values, float) and not math.isfinite(values) else values
+
+#Writes equal length columns as a tab separated table or a JSON object of lists, None (no value) as '-' in tables
+def _write_table(columns, as_json, out):
+    if as_json:
+        json.dump({name: _json_values(np.asarray(values).tolist()) for name, values in columns.items()}, out)
+        out.write('\n')
+        return
+    out.write('\t'.join(columns) + '\n')
+    for row in zip(*columns.values()):
+        out.write('\t'.join(value if isinstance(value, str) else '-' if value is None else f'{value:.10g}' for value in row) + '\n')
+
+def _show_figures(plot_func, results, *args):
+    import matplotlib.pyplot as plt
+    for i in range(len(results['T'])):
+        fig, ax = plt.subplots()
+        plot_func(results, *args, i, ax)
+        plt.show()
+
+def main(argv=None, out=None):
+    args = _parse_args(argv)
+    out = sys.stdout if out is None else out
+    if not (args.telemetry or args.live):
+        return _run(args, out)
+
+    from . import telemetry
+    with telemetry.collect() as stats:
+        with stats.watch() if args.live else nullcontext():
+            status = _run(args, out)
+    if args.telemetry:
+        stats.dump(args.telemetry)
+    sys.stderr.write(stats.summary() + '\n')
+    return status
+
+def _run(args, out):
+    if args.store:
+        from .store import load_store
+        from .thermo import set_database
+        set_database(load_store(args.store))
+    temps = np.asarray(getattr(args, 'temps', None) or get_database().temps, dtype=float)
+    cache = None
+    if getattr(args, 'cache_dir', None):
+        from .cache import ResultCache
+        cache = ResultCache(args.cache_dir)
+
+    if args.analysis == 'render':
+        from .render import render_figures
+        T_fine = np.arange(temps.min(), temps.max() + 1, 1, dtype=float)
+        results = analyses.calc_all(temps, T_fine, cache=cache)
+        written, skipped = render_figures(results, args.output_dir, args.formats, args.workers, args.dpi, args.force)
+        out.write(f'{len(written)} figures written, {len(skipped)} unchanged, in {args.output_dir}\n')
+
+    elif args.analysis == 'export':
+        from . import export
+        P_H2 = np.asarray(args.pressures if args.pressures else analyses.P_H2_range, dtype=float)
+        T_fine = np.arange(temps.min(), temps.max() + 1, 1, dtype=float)
+        results = {
+            'activity': analyses.calc_activity_curves(temps),
+            'liquidus': analyses.calc_liquidus_curve(),
+            'reduction': analyses.calc_reduction(temps, cache=cache),
+            'reduction_fine': analyses.calc_reduction(T_fine, cache=cache),
+            'delta_G': analyses.calc_delta_G_curves(temps),
+            'reactant_ratio': analyses.calc_reactant_ratio(),
+            'hyd_delta_G': analyses.calc_hyd_delta_G_curves(temps),
+        }
+        #The hydride grid is the big one, so it is solved a block of temperatures at a time while it is written
+        def hydride_chunks():
+            return export.hydride_grid_chunks(temps, P_H2, args.chunk_rows, cache=cache)
+        if args.adaptive:
+            from .adaptive import calc_adaptive_all
+            results.update(calc_adaptive_all(temps, P_H2.min(), P_H2.max()))
+            hydride_chunks = None
+        paths = export.export_results(results, args.output_dir, args.formats, args.chunk_rows, hydride_chunks)
+        out.write(f'{len(paths)} files written in {args.output_dir}\n')
+
+    elif args.analysis == 'uncertainty':
+        from . import uncertainty
+        is_ideal = 'true' if args.ideal else 'false'
+        if args.pressures:
+            bands = uncertainty.sample_hydride(temps, args.pressures, args.samples, is_ideal=is_ideal, seed=args.seed, workers=args.workers)
+            n_T, n_P = bands['X_Nd_mean'].shape
+            columns = {'T': np.repeat(bands['T'], n_P), 'P_H2': np.tile(bands['P_H2'], n_T)}
+        else:
+            bands = uncertainty.sample_reduction(temps, args.samples, is_ideal=is_ideal, seed=args.seed, workers=args.workers)
+            columns = {'T': bands['T']}
+        columns['X_Nd_mean'] = bands['X_Nd_mean'].ravel()
+        columns['X_Nd_std'] = bands['X_Nd_std'].ravel()
+        for q, values in zip(bands['quantiles'], bands['X_Nd_quantiles']):
+            columns[f'X_Nd_q{100 * q:g}'] = values.ravel()
+        _write_table(columns, args.json, out)
+
+    elif args.analysis == 'design':
+        from .design import operating_window
+        if not args.temps:
+            temps = np.arange(650, 851, 1, dtype=float)
+        is_ideal = 'true' if args.ideal else 'false'
+        window = operating_window(args.recovery, temps, args.pressures, is_ideal, args.margin, cache=cache)
+        n_T, n_P = window['Nd2O3_max'].shape
+        _write_table({
+            'T': np.repeat(window['T'], n_P),
+            'P_H2': np.tile(window['P_H2'], n_T),
+            'X_Nd_limit': window['X_Nd_limit'].ravel(),
+            'Nd2O3_max': window['Nd2O3_max'].ravel(),
+            'limit': window['limit'].ravel(),
+        }, args.json, out)
+        if not args.json:
+            best = window['best']
+            out.write(f"#best: T {best['T']:g}, P_H2 {best['P_H2']:g}, Nd2O3 fraction {best['Nd2O3_max']:.6g}, final X Nd {best['X_Nd']:.6g}, limited by {best['limit']}\n")
+            out.write('#limit: ' + ', '.join(f'{i} {name}' for i, name in enumerate(window['limit_names'])) + '\n')
+
+    elif args.analysis == 'bench':
+        from . import benchmarks
+        if args.write_golden:
+            benchmarks.save_golden(args.write_golden)
+            out.write(f'Golden arrays written to {args.write_golden}\n')
+            return 0
+
+        if not args.check_only:
+            last = benchmarks.last_records(args.history) if args.history else {}
+            records = benchmarks.run_benchmarks(args.history, args.max_temps, args.max_pressures, args.repeat)
+            out.write('stage\tn_T\tn_P\tseconds\tpoints_per_second\tpeak_MB\tvs_last\n')
+            for record in records:
+                previous = last.get((record['stage'], record['n_T'], record['n_P']))
+                vs_last = f"{record['seconds'] / previous['seconds']:.2f}x" if previous else '-'
+                out.write(f"{record['stage']}\t{record['n_T']}\t{record['n_P'] or '-'}\t{record['seconds']:.4g}\t"
+                          f"{record['points_per_second']:.4g}\t{record['peak_bytes'] / 1024**2:.1f}\t{vs_last}\n")
+
+        checks = benchmarks.check_golden(args.golden or benchmarks.golden_path, recompute=args.recompute_golden)
+        for check in checks:
+            out.write(f"{'ok  ' if check['passed'] else 'FAIL'} {check['name']}: max difference {check['max_abs_diff']:.3g} (tolerance {check['atol']:g})\n")
+        if not all(check['passed'] for check in checks):
+            return 1
+
+    elif args.analysis == 'tables':
+        from .tables import build_tables
+        tables = build_tables(args.output_dir, args.temps)
+        out.write(f'{len(tables.T)} x {len(tables.X_Nd)} delta G tables written in {args.output_dir}\n')
+
+    elif args.analysis == 'store':
+        from . import store
+        if args.thermocalc and args.hsc:
+            liquidus = store.import_liquidus(args.liquidus, args.species) if args.liquidus else None
+            store.import_store(args.output_dir, args.thermocalc, args.hsc, args.species, dict(args.hsc_column),
+                               args.thermocalc_T_unit, 'C', 'J' if args.hsc_joules else 'kJ', liquidus)
+            if liquidus is None:
+                out.write('No --liquidus given, the store has no liquidus for the Mg3Nd limits\n')
+        elif args.thermocalc or args.hsc or args.liquidus:
+            raise SystemExit('--thermocalc and --hsc are needed together, and --liquidus goes with them')
+        else:
+            store.write_builtin_store(args.output_dir)
+        out.write(f'Data store written in {args.output_dir}\n')
+
+    elif args.analysis == 'serve':
+        import asyncio
+        from .service import serve
+        db = get_database() if args.store else None
+        def ready(server):
+            out.write(f'Listening on http://{args.host}:{args.port}\n')
+            out.flush()
+        try:
+            asyncio.run(serve(args.host, args.port, ready, db=db, cache_size=args.cache_size,
+                              batch_window=args.batch_window, workers=args.workers))
+        except KeyboardInterrupt:
+            pass
+
+    elif args.analysis == 'phasemap':
+        from .phasemap import build_region_map
+        T_low, T_high = args.T_range if args.T_range else (None, None)
+        region_map = build_region_map(args.pressures, T_low, T_high, 'true' if args.ideal else 'false')
+        crossings = region_map.intersections
+        _write_table({
+            'boundaries': ['-'.join(crossing['boundaries']) for crossing in crossings],
+            'P_H2': [crossing['P_H2'] for crossing in crossings],
+            'T': [crossing['T'] for crossing in crossings],
+            'X_Nd': [crossing['X_Nd'] for crossing in crossings],
+        }, args.json, out)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(_json_values(region_map.to_dict()), f)
+
+    elif args.analysis == 'simulate':
+        from .kinetics import simulate
+        profiles = []
+        for name, values in (('--temps', args.temps), ('--pressures', args.pressures)):
+            if len(values) == 1:
+                profiles.append(values[0])
+            elif len(values) == len(args.times):
+                profiles.append((args.times, values))
+            else:
+                raise SystemExit(f'{name} needs one value or one per --times value')
+        #Rows are written as the snapshots come, so long runs never pile up in memory
+        out.write('t\tNd2O3_i\tT\tP_H2\tX_Nd\tX_Nd_Mg3Nd\tNdH2\tliquidus_crossing_time\n')
+        is_ideal = 'true' if args.ideal else 'false'
+        for snapshot in simulate(args.ratios, profiles[0], profiles[1], args.t_end, args.every, is_ideal, rtol=args.rtol):
+            for i, ratio in enumerate(args.ratios):
+                out.write(f"{snapshot['t']:.10g}\t{ratio:.10g}\t{snapshot['T'][i]:.10g}\t{snapshot['P_H2'][i]:.10g}\t"
+                          f"{snapshot['X_Nd'][i]:.10g}\t{snapshot['X_Nd_Mg3Nd'][i]:.10g}\t{snapshot['NdH2'][i]:.10g}\t"
+                          f"{snapshot['liquidus_crossing_time'][i]:.10g}\n")
+
+    elif args.analysis == 'reduction':
+        reduction = analyses.calc_reduction(temps, cache=cache)
+        _write_table({
+            'T': reduction['T'],
+            'X_Nd_eq_ideal': reduction['X_Nd_eq_ideal'],
+            'X_Nd_eq_nonideal': reduction['X_Nd_eq_nonideal'],
+        }, args.json, out)
+        if args.plot:
+            import matplotlib.pyplot as plt
+            from . import plots
+            fig, ax = plt.subplots()
+            plots.plot_eq_comp_vs_T(reduction, analyses.calc_liquidus_curve(), ax)
+            plt.show()
+
+    elif args.analysis == 'hydride':
+        P_H2 = args.pressures if args.pressures else analyses.P_H2_range
+        hydride = analyses.calc_hydride(temps, P_H2, cache=cache)
+        n_T, n_P = hydride['X_Nd_eq_hyd_ideal'].shape
+        _write_table({
+            'T': np.repeat(hydride['T'], n_P),
+            'P_H2': np.tile(hydride['P_H2'], n_T),
+            'X_Nd_eq_hyd_ideal': hydride['X_Nd_eq_hyd_ideal'].ravel(),
+            'X_Nd_eq_hyd_nonideal': hydride['X_Nd_eq_hyd_nonideal'].ravel(),
+        }, args.json, out)
+        if args.plot:
+            from . import plots
+            _show_figures(plots.plot_hydride, hydride, calc_X_Nd_Mg3Nd(hydride['T']))
+
+    else:
+        X_Nd = args.x_nd if args.x_nd else analyses.X_Nd_range
+        if args.hydride:
+            curves = analyses.calc_hyd_delta_G_curves(temps, X_Nd)
+            names = ('hyd_delta_G_ideal', 'hyd_delta_G_nonideal')
+        else:
+            curves = analyses.calc_delta_G_curves(temps, X_Nd)
+            names = ('delta_G_ideal', 'delta_G_nonideal')
+        n_T, n_X = curves[names[0]].shape
+        columns = {'T': np.repeat(curves['T'], n_X), 'X_Nd': np.tile(curves['X_Nd'], n_T)}
+        for name in names:
+            columns[name] = curves[name].ravel()
+        _write_table(columns, args.json, out)
+        if args.plot:
+            from . import plots
+            plot_func = plots.plot_hyd_delta_G if args.hydride else plots.plot_delta_G
+            _show_figures(plot_func, curves, analyses.calc_liquidus_curve())
+
+    return 0
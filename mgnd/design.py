@@ -0,0 +1,88 @@
+import numpy as np
+
+from . import analyses
+from .thermo import calc_X_Nd_Mg3Nd, get_database
+
+#PROCESS DESIGN
+#Inverse of the reactant ratio figure: the largest Nd2O3 charge that still reaches a target Nd recovery
+#Charging f mol Nd2O3 (f = fraction of the stoichiometric ratio) per 3 mol Mg and reducing a fraction r of it leaves
+#    X Nd = 2rf / (3 - rf)
+#which is calc_reactant_ratio with Nd2O3_i = rf. Recovery r is reached if that X Nd stays
+#    below the equilibrium reduction X Nd (reduction stops there),
+#    below the Mg3Nd liquidus X Nd (Mg3Nd forms above it),
+#    below the equilibrium hydriding X Nd at the H2 pressure (NdH2 precipitates above it)
+#so the largest charge is f = 3 X_lim / (r (2 + X_lim)) with X_lim the lowest of the three, capped at stoichiometric (f = 1)
+#Every limit is evaluated on the whole (T, P_H2) grid at once
+#Above the last liquidus data point (779.94 C) the liquidus extrapolates far past X Nd = 1 and never limits
+
+limit_names = ('reduction', 'Mg3Nd', 'hydride')
+
+#X Nd reached when a fraction Nd2O3_i of the stoichiometric Nd2O3 is fully reduced by 3 mol Mg
+def calc_X_Nd_full_red(Nd2O3_i):
+    Nd2O3_i = np.asarray(Nd2O3_i, dtype=float)
+    return 2 * Nd2O3_i / (3 - Nd2O3_i)
+
+#Inverse of calc_X_Nd_full_red
+def calc_Nd2O3_full_red(X_Nd):
+    X_Nd = np.asarray(X_Nd, dtype=float)
+    return 3 * X_Nd / (2 + X_Nd)
+
+#Highest X Nd allowed by each limit over the (T, P_H2) grid, shape (3, n_T, n_P) in the order of limit_names
+#margin is taken off every limit, e.g. 0.005 keeps the melt 0.005 X Nd away from each boundary
+def calc_X_Nd_limits(temps, P_H2, is_ideal='false', margin=0, db=None, cache=None):
+    if db is None:
+        db = get_database()
+    temps = np.asarray(temps, dtype=float)
+    P_H2 = np.asarray(P_H2, dtype=float)
+    suffix = 'ideal' if is_ideal == 'true' else 'nonideal'
+
+    X_Nd_eq = analyses.calc_reduction(temps, db, cache)[f'X_Nd_eq_{suffix}']
+    X_Nd_Mg3Nd = calc_X_Nd_Mg3Nd(temps, db)
+    #No hydrogen, no hydride limit
+    shape = (len(temps), len(P_H2))
+    X_Nd_hyd = np.full(shape, np.inf)
+    has_H2 = P_H2 > 0
+    if has_H2.any():
+        X_Nd_hyd[:, has_H2] = analyses.calc_hydride(temps, P_H2[has_H2], db, cache)[f'X_Nd_eq_hyd_{suffix}']
+
+    return np.stack([
+        np.broadcast_to(X_Nd_eq[:, np.newaxis], shape),
+        np.broadcast_to(X_Nd_Mg3Nd[:, np.newaxis], shape),
+        X_Nd_hyd,
+    ]) - margin
+
+#Operating window for a target Nd recovery (0-1] over every temperature and H2 pressure
+#Returns the maximum Nd2O3 fraction of the stoichiometric ratio at each (T, P_H2), which limit sets it,
+#and the best operating point; with ratios given, also a (T, ratio, P_H2) feasibility mask
+def operating_window(recovery, temps, P_H2, is_ideal='false', margin=0, ratios=None, db=None, cache=None):
+    temps = np.asarray(temps, dtype=float)
+    P_H2 = np.asarray(P_H2, dtype=float)
+    limits = calc_X_Nd_limits(temps, P_H2, is_ideal, margin, db, cache)
+    limit = np.argmin(limits, axis=0)
+    X_Nd_lim = np.clip(np.min(limits, axis=0), 0, None)
+
+    #Charge that leaves exactly X_Nd_lim at the target recovery, no more than the stoichiometric charge
+    Nd2O3_max = np.minimum(calc_Nd2O3_full_red(X_Nd_lim) / recovery, 1)
+
+    i, j = np.unravel_index(np.argmax(Nd2O3_max), Nd2O3_max.shape)
+    window = {
+        'T': temps,
+        'P_H2': P_H2,
+        'recovery': recovery,
+        'X_Nd_limit': X_Nd_lim,
+        'Nd2O3_max': Nd2O3_max,
+        'limit': limit,
+        'limit_names': limit_names,
+        'best': {
+            'T': temps[i],
+            'P_H2': P_H2[j],
+            'Nd2O3_max': Nd2O3_max[i, j],
+            'X_Nd': calc_X_Nd_full_red(recovery * Nd2O3_max[i, j]),
+            'limit': limit_names[limit[i, j]],
+        },
+    }
+    if ratios is not None:
+        ratios = np.asarray(ratios, dtype=float)
+        window['ratios'] = ratios
+        window['feasible'] = ratios[np.newaxis, :, np.newaxis] <= Nd2O3_max[:, np.newaxis, :]
+    return window
@@ -0,0 +1,216 @@
+import os
+
+import numpy as np
+
+#EXPORT
+#Writes each result family as a tidy long-format table (one row per T and grid point) instead of one padded wide sheet
+#Tables are produced as a stream of column chunks, so writers never hold a whole table in memory
+#CSV needs nothing extra, Parquet needs pyarrow and xlsx needs xlsxwriter (used in constant memory mode)
+
+chunk_rows = 250000
+
+#Per temperature grid families: (grid column, value columns with one row per temperature), written as a T x grid long table
+#Families that are already one row per point are written with the columns listed in flat_columns
+table_layouts = {
+    'activity': ('X_Nd', ('gamma_Nd', 'gamma_Mg', 'a_Nd', 'a_Mg')),
+    'delta_G': ('X_Nd', ('delta_G_ideal', 'delta_G_nonideal')),
+    'hyd_delta_G': ('X_Nd', ('hyd_delta_G_ideal', 'hyd_delta_G_nonideal')),
+    'hydride': ('P_H2', ('X_Nd_eq_hyd_ideal', 'X_Nd_eq_hyd_nonideal')),
+}
+flat_columns = {
+    'reduction': ('T', 'X_Nd_eq_ideal', 'X_Nd_eq_nonideal'),
+    'reduction_fine': ('T', 'X_Nd_eq_ideal', 'X_Nd_eq_nonideal'),
+    'reactant_ratio': ('Nd2O3_i', 'X_Nd_full_red'),
+    'liquidus': ('T', 'X_Nd'),
+}
+#Extra columns of the adaptive families (see the adaptive module), written whenever a family has them:
+#the error bound of the interval starting at each grid point (NaN at the last point, which starts none)
+#and the number of evaluations that made the grid, repeated on every row
+adaptive_columns = ('error', 'evaluations')
+
+#Adaptive columns for the grid points start:stop, each repeated n_repeat times (once per temperature)
+def _adaptive_chunk(family, start, stop, n_repeat):
+    chunk = {}
+    if 'error' in family:
+        error = np.append(np.asarray(family['error'], dtype=float), np.nan)[start:stop]
+        chunk['error'] = np.tile(error, n_repeat)
+    if 'evaluations' in family:
+        chunk['evaluations'] = np.full((stop - start) * n_repeat, family['evaluations'], dtype=float)
+    return chunk
+
+#Chunks of {column name: 1-D array} for one result family, at most rows rows each (whole temperatures at a time)
+def family_chunks(name, family, rows=chunk_rows):
+    if name in flat_columns:
+        columns = flat_columns[name]
+        n = len(family[columns[0]])
+        for start in range(0, n, rows):
+            chunk = {column: np.asarray(family[column][start:start + rows]) for column in columns}
+            chunk.update(_adaptive_chunk(family, start, min(start + rows, n), 1))
+            yield chunk
+        return
+
+    grid_name, value_names = table_layouts[name]
+    grid = np.asarray(family[grid_name])
+    temps_per_chunk = max(1, rows // len(grid))
+    for start in range(0, len(family['T']), temps_per_chunk):
+        T = family['T'][start:start + temps_per_chunk]
+        chunk = {'T': np.repeat(T, len(grid)), grid_name: np.tile(grid, len(T))}
+        for value_name in value_names:
+            chunk[value_name] = np.asarray(family[value_name][start:start + temps_per_chunk]).ravel()
+        chunk.update(_adaptive_chunk(family, 0, len(grid), len(T)))
+        yield chunk
+
+#Hydride grid chunks computed a block of temperatures at a time, for grids too large to solve in one go
+def hydride_grid_chunks(temps, P_H2, rows=chunk_rows, db=None, cache=None):
+    from .analyses import calc_hydride
+    temps = np.asarray(temps, dtype=float)
+    temps_per_chunk = max(1, rows // len(P_H2))
+    for start in range(0, len(temps), temps_per_chunk):
+        hydride = calc_hydride(temps[start:start + temps_per_chunk], P_H2, db, cache)
+        yield from family_chunks('hydride', hydride, rows)
+
+#Writers take a table a chunk at a time (write) and finish it with close, so one stream of chunks can feed
+#every format at once; the write_* functions below write a whole stream to one file
+class _CsvTable:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.header = True
+
+    def write(self, chunk):
+        if self.header:
+            self.file.write(','.join(chunk) + '\n')
+            self.header = False
+        np.savetxt(self.file, np.column_stack(list(chunk.values())), delimiter=',', fmt='%.10g')
+
+    def close(self):
+        self.file.close()
+
+class _ParquetTable:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Parquet export needs pyarrow (pip install pyarrow)') from None
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.writer = None
+
+    #Each chunk is its own row group
+    def write(self, chunk):
+        table = self.pa.table(chunk)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+#One workbook in constant memory mode, with a sheet per table (sheet returns the writer for it)
+#Sheets longer than Excel's row limit carry on in sheets named e.g. hydride_2
+class _XlsxBook:
+    max_rows = 1048576
+
+    def __init__(self, path):
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise ImportError('xlsx export needs xlsxwriter (pip install xlsxwriter)') from None
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True})
+
+    def sheet(self, sheet_name):
+        return _XlsxSheet(self, sheet_name)
+
+    def close(self):
+        self.workbook.close()
+
+class _XlsxSheet:
+    def __init__(self, book, sheet_name):
+        self.book = book
+        self.sheet_name = sheet_name
+        self.sheet = None
+        self.part = 1
+        self.row = 0
+
+    def write(self, chunk):
+        values = np.column_stack(list(chunk.values()))
+        i = 0
+        while i < len(values):
+            if self.sheet is None or self.row == self.book.max_rows:
+                name = self.sheet_name if self.part == 1 else f'{self.sheet_name}_{self.part}'
+                self.sheet = self.book.workbook.add_worksheet(name[:31])
+                self.sheet.write_row(0, 0, list(chunk))
+                self.part += 1
+                self.row = 1
+            n = min(len(values) - i, self.book.max_rows - self.row)
+            for values_row in values[i:i + n]:
+                self.sheet.write_row(self.row, 0, values_row.tolist())
+                self.row += 1
+            i += n
+
+    #The workbook is closed by the book
+    def close(self):
+        pass
+
+#Feeds every chunk to all the writers and closes them
+def _write_tables(writers, chunks):
+    try:
+        for chunk in chunks:
+            for writer in writers:
+                writer.write(chunk)
+    finally:
+        for writer in writers:
+            writer.close()
+
+def write_csv(path, chunks):
+    _write_tables([_CsvTable(path)], chunks)
+
+def write_parquet(path, chunks):
+    _write_tables([_ParquetTable(path)], chunks)
+
+#tables is an iterable of (sheet name, chunks)
+def write_xlsx(path, tables):
+    book = _XlsxBook(path)
+    try:
+        for sheet_name, chunks in tables:
+            _write_tables([book.sheet(sheet_name)], chunks)
+    finally:
+        book.close()
+
+#Writes every family in results to output_dir as e.g. hydride.csv / hydride.parquet, plus one results.xlsx with a sheet per family
+#hydride_chunks can replace results['hydride'] with a lazily computed stream (see hydride_grid_chunks)
+#Each table's chunks are made once and written to every format together, so a lazy hydride grid is only solved once
+#Returns the paths written
+def export_results(results, output_dir, formats=('csv',), rows=chunk_rows, hydride_chunks=None):
+    os.makedirs(output_dir, exist_ok=True)
+    file_classes = {'csv': _CsvTable, 'parquet': _ParquetTable}
+    tables = [(name, family_chunks(name, family, rows)) for name, family in results.items()
+              if (name in flat_columns or name in table_layouts) and not (name == 'hydride' and hydride_chunks is not None)]
+    if hydride_chunks is not None:
+        tables.append(('hydride', hydride_chunks()))
+
+    paths = []
+    book = _XlsxBook(os.path.join(output_dir, 'results.xlsx')) if 'xlsx' in formats else None
+    try:
+        for name, chunks in tables:
+            writers = []
+            try:
+                for fmt in formats:
+                    if fmt == 'xlsx':
+                        writers.append(book.sheet(name))
+                    else:
+                        path = os.path.join(output_dir, f'{name}.{fmt}')
+                        writers.append(file_classes[fmt](path))
+                        paths.append(path)
+            except BaseException:
+                for writer in writers:
+                    writer.close()
+                raise
+            _write_tables(writers, chunks)
+    finally:
+        if book is not None:
+            book.close()
+    if book is not None:
+        paths.append(os.path.join(output_dir, 'results.xlsx'))
+    return paths
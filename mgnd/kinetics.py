@@ -0,0 +1,161 @@
+import numpy as np
+
+from .solvers import calc_delta_G, calc_hyd_delta_G
+from .thermo import calc_X_Nd_Mg3Nd, get_database
+
+#KINETICS
+#Time stepping of Nd2O3 reduction by Mg and NdH2 precipitation for a whole ensemble of furnace runs at once
+#State per run (mol): Nd2O3, Mg and Nd in the liquid, MgO, NdH2; the charge is Nd2O3_i mol Nd2O3 per 3 mol Mg
+#like calc_reactant_ratio
+#Rates follow the thermodynamic driving force of each reaction, 1 - exp(delta G / RT), capped at -1 so the
+#reverse direction doesn't blow up:
+#    reduction, Nd2O3 + 3 Mg = 2 Nd + 3 MgO:  rate = k_red(T) * n_Nd2O3 * max(0, 1 - exp(delta G / RT))
+#    hydride, Nd + H2 = NdH2:                  rate = k_hyd(T) * (n_Nd forming, n_NdH2 dissolving) * (1 - exp(delta G / RT))
+#with the hydride delta G at the current P_H2, so X Nd settles at the equilibrium reduction or hydriding X Nd
+#k(T) = A exp(-Ea / RT); default_rate_constants are placeholders to be fitted to furnace data, not measured values
+#The rates slow right down as X Nd closes in on equilibrium, so the steps are picked by scipy's BDF within rtol/atol
+#(stiff there), and runs to steady state take a few hundred steps rather than one per second
+#The runs don't interact, so the Jacobian is block diagonal, one 5 x 5 block per run; BDF is told so (jac_sparsity),
+#which makes a Jacobian cost 5 rate evaluations and a sparse LU whatever the ensemble size
+#T and P_H2 can change with time and differ between runs; results are streamed out as a generator of snapshots
+#    for snapshot in simulate(Nd2O3_i=[0.1, 0.2], T=([0, 3600], [700, 800]), P_H2=0.1, t_end=7200):
+#        ...
+
+#(A in 1/s, Ea in J/mol) for each reaction
+default_rate_constants = {
+    'reduction': (4.5e4, 150000),
+    'hydride': (2.0e3, 100000),
+}
+
+state_names = ('Nd2O3', 'Mg', 'Nd', 'MgO', 'NdH2')
+
+#Times where a (times, values) profile changes slope, none for the other kinds
+def _profile_times(profile):
+    return np.asarray(profile[0], dtype=float) if isinstance(profile, tuple) else np.zeros(0)
+
+#Value of a profile at time t for every run: a number, a callable f(t), or (times, values) linear in time
+#with values either shared (n_times) or one row per run (n_runs, n_times)
+def profile_value(profile, t, n_runs):
+    if callable(profile):
+        value = profile(t)
+    elif isinstance(profile, tuple):
+        times, values = (np.asarray(part, dtype=float) for part in profile)
+        if values.ndim == 1:
+            value = np.interp(t, times, values)
+        else:
+            #Same times for every run, so one interval and weight does all the rows (held constant past the ends like np.interp)
+            t = np.clip(t, times[0], times[-1])
+            i = np.clip(np.searchsorted(times, t) - 1, 0, len(times) - 2)
+            w = (t - times[i]) / (times[i + 1] - times[i])
+            value = (1 - w) * values[:, i] + w * values[:, i + 1]
+    else:
+        value = profile
+    return np.broadcast_to(np.asarray(value, dtype=float), (n_runs,))
+
+def rate_constant(T, A, Ea):
+    return A * np.exp(-Ea / (8.314 * (T + 273.15)))
+
+#Rates of the two reactions (mol/s) for state arrays n (5, n_runs) at T and P_H2
+def reaction_rates(n, T, P_H2, is_ideal, rate_constants, db):
+    n_Nd2O3, n_Mg, n_Nd, n_MgO, n_NdH2 = n
+    X_Nd = n_Nd / (n_Nd + n_Mg)
+    RT = 8.314 * (T + 273.15)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        delta_G = calc_delta_G(X_Nd, is_ideal, db.Gf(T, 'Gf_MgO'), db.Gf(T, 'Gf_Nd2O3'), db.Gf(T, 'Gf_NdL'), T, db)
+        drive_red = np.clip(-np.expm1(delta_G / RT), 0, 1)
+        hyd_delta_G = calc_hyd_delta_G(X_Nd, is_ideal, db.Gf(T, 'Gf_NdH2'), db.Gf(T, 'Gf_NdL'), T, db) - RT * np.log(P_H2)
+        drive_hyd = np.clip(-np.expm1(hyd_delta_G / RT), -1, 1)
+    drive_hyd = np.nan_to_num(drive_hyd, nan=0.0)
+    r_red = rate_constant(T, *rate_constants['reduction']) * n_Nd2O3 * drive_red
+    r_hyd = rate_constant(T, *rate_constants['hydride']) * np.where(drive_hyd > 0, n_Nd, n_NdH2) * drive_hyd
+    return r_red, r_hyd
+
+#Change of the state per unit time from the two rates
+def _derivative(r_red, r_hyd):
+    return np.array([-r_red, -3 * r_red, 2 * r_red - r_hyd, 3 * r_red, r_hyd])
+
+#Generator of snapshots every output_every seconds (plus the end), each a dict of arrays over runs:
+#t, T, P_H2, X_Nd, the X Nd where Mg3Nd forms, moles of each species, reduction and hydride rates,
+#and the time each run first crossed the Mg3Nd liquidus (NaN until it does)
+#Snapshots come from the integrator's interpolant between its steps, and a liquidus crossing is bisected on it
+#Only the current step is kept, so long runs use constant memory
+def simulate(Nd2O3_i, T, P_H2=0, t_end=3600, output_every=60, is_ideal='false', rate_constants=None, rtol=1e-6, atol=1e-10, db=None):
+    from scipy import sparse
+    from scipy.integrate import BDF
+    if db is None:
+        db = get_database()
+    rate_constants = {**default_rate_constants, **(rate_constants or {})}
+    Nd2O3_i = np.atleast_1d(np.asarray(Nd2O3_i, dtype=float))
+    n_runs = len(Nd2O3_i)
+    n = np.zeros((len(state_names), n_runs))
+    n[0] = Nd2O3_i
+    n[1] = 3
+    #State index i * n_runs + run, so the blocks of one run are n_runs apart
+    sparsity = sparse.kron(np.ones((len(state_names), len(state_names))), sparse.identity(n_runs), format='csc')
+
+    def derivative(t, y):
+        n = np.maximum(y.reshape(len(state_names), n_runs), 0)
+        return _derivative(*reaction_rates(n, profile_value(T, t, n_runs), profile_value(P_H2, t, n_runs),
+                                           is_ideal, rate_constants, db)).ravel()
+
+    #X Nd past the liquidus of every run at time t, >= 0 once Mg3Nd forms
+    def past_liquidus(n, t):
+        return n[2] / (n[2] + n[1]) - calc_X_Nd_Mg3Nd(profile_value(T, t, n_runs), db)
+
+    def snapshot(t, n):
+        T_now = profile_value(T, t, n_runs)
+        P_now = profile_value(P_H2, t, n_runs)
+        r_red, r_hyd = reaction_rates(n, T_now, P_now, is_ideal, rate_constants, db)
+        result = {'t': float(t), 'T': T_now, 'P_H2': P_now, 'X_Nd': n[2] / (n[2] + n[1]), 'X_Nd_Mg3Nd': calc_X_Nd_Mg3Nd(T_now, db),
+                  'rate_reduction': r_red, 'rate_hydride': r_hyd,
+                  'liquidus_crossing_time': np.where(crossing_time <= t, crossing_time, np.nan)}
+        result.update({name: n[i].copy() for i, name in enumerate(state_names)})
+        return result
+
+    crossing_time = np.where(past_liquidus(n, 0) >= 0, 0.0, np.nan)
+    yield snapshot(0, n)
+    outputs = np.append(np.arange(output_every, t_end, output_every), t_end)
+    k = 0
+    #Profile times are integrated up to and restarted from, so no step runs over a change of ramp
+    t_now = 0
+    for t_stop in np.unique(np.concatenate([_profile_times(T), _profile_times(P_H2), [t_end]])):
+        if not 0 < t_stop <= t_end:
+            continue
+        solver = BDF(derivative, t_now, n.ravel(), t_stop, rtol=rtol, atol=atol, jac_sparsity=sparsity)
+        while solver.status == 'running':
+            solver.step()
+            if solver.status == 'failed':
+                raise RuntimeError(f'kinetics integration failed at t = {solver.t:g} s: {solver.message}')
+            interpolant = solver.dense_output()
+
+            def state(t):
+                return np.maximum(interpolant(t).reshape(len(state_names), n_runs, *np.shape(t)), 0)
+
+            #Runs that crossed the liquidus during the step, bisected for the time they did
+            new = np.isnan(crossing_time) & (past_liquidus(state(solver.t), solver.t) >= 0)
+            if new.any():
+                i = np.flatnonzero(new)
+                t_low = np.full(len(i), solver.t_old)
+                t_high = np.full(len(i), solver.t)
+                for iteration in range(40):
+                    t_mid = 0.5 * (t_low + t_high)
+                    n_mid = state(t_mid)[:, i, np.arange(len(i))]
+                    T_mid = np.array([profile_value(T, t, n_runs)[run] for t, run in zip(t_mid, i)])
+                    crossed = n_mid[2] / (n_mid[2] + n_mid[1]) >= calc_X_Nd_Mg3Nd(T_mid, db)
+                    t_high = np.where(crossed, t_mid, t_high)
+                    t_low = np.where(crossed, t_low, t_mid)
+                crossing_time[i] = t_high
+
+            while k < len(outputs) and outputs[k] <= solver.t:
+                yield snapshot(outputs[k], state(outputs[k]))
+                k += 1
+        n = np.maximum(solver.y.reshape(len(state_names), n_runs), 0)
+        t_now = t_stop
+
+#Stacks chosen arrays from every snapshot, e.g. trajectories(simulate(...), ('t', 'X_Nd')) -> {'t': (n_out,), 'X_Nd': (n_out, n_runs)}
+def trajectories(snapshots, names=('t', 'T', 'X_Nd')):
+    collected = {name: [] for name in names}
+    for snapshot in snapshots:
+        for name in names:
+            collected[name].append(snapshot[name])
+    return {name: np.array(values) for name, values in collected.items()}
@@ -0,0 +1,336 @@
+import numpy as np
+
+from . import analyses
+from .solvers import calc_delta_G, calc_eq_comp, calc_hyd_delta_G, calc_hyd_eq_comp
+from .thermo import calc_X_Nd_Mg3Nd, get_database, liquidus_breaks, liquidus_points
+
+#PROCESS MAPS
+#Traces the phase boundaries as continuous curves X Nd(T) and finds where they cross, instead of dense grids
+#    reduction: delta G of Nd2O3 + 3 Mg = 2 Nd + 3 MgO is 0, reduction stops at higher X Nd
+#    Mg3Nd: the Mg3Nd liquidus, Mg3Nd forms at higher X Nd (only up to the last liquidus data point, 779.94 C for Mg-Nd)
+#    hydride: delta G of Nd + H2 = NdH2 is RT ln(P_H2), NdH2 precipitates at higher X Nd, one curve per pressure
+#Each boundary F(T, X Nd) = 0 (F = delta G / RT) is followed by pseudo-arclength continuation: a step along the
+#tangent (predictor), then Newton back onto the curve perpendicular to it (corrector), with the step size grown or cut
+#from the Newton iterations, the turn of the tangent (a step h turning by an angle a is off by about h a / 8) and the
+#curve solved at the middle of the step, so straight lines between the traced points stay within chord_tol in X Nd
+#(checked against the direct solvers: within 1e-5 for the default chord_tol, P_H2 0.0005-1.1, ideal and nonideal);
+#the kinks of gamma in T and X Nd and of the liquidus spline are traced points; all pressures are traced together as arrays
+#Crossings of two boundaries are bracketed on the traced points and bisected on the exact functions:
+#the reduction X Nd meeting Mg3Nd, and for each P_H2 the hydride boundary meeting Mg3Nd and the reduction X Nd
+#Along the reduction and Mg3Nd curves the P_H2 where NdH2 starts to form is closed form,
+#P_H2 = exp(hydride delta G / RT), which gives the boundaries in (T, P_H2) as well
+#    region_map = build_region_map([0.01, 0.1, 1])
+#    region_map.intersections, region_map.boundary('hydride', 760, 0.1), region_map.classify(T, X_Nd, P_H2)
+
+region_flags = {'reduction_stopped': 1, 'Mg3Nd': 2, 'NdH2': 4}
+
+#Boundary functions, F(T, X Nd) = 0 on the boundary, increasing into the region past it
+def reduction_F(T, X_Nd, is_ideal='false', db=None):
+    if db is None:
+        db = get_database()
+    return calc_delta_G(X_Nd, is_ideal, db.Gf(T, 'Gf_MgO'), db.Gf(T, 'Gf_Nd2O3'), db.Gf(T, 'Gf_NdL'), T, db) / (8.314 * (T + 273.15))
+
+def hydride_F(T, X_Nd, P_H2, is_ideal='false', db=None):
+    if db is None:
+        db = get_database()
+    return np.log(P_H2) - calc_hyd_delta_G(X_Nd, is_ideal, db.Gf(T, 'Gf_NdH2'), db.Gf(T, 'Gf_NdL'), T, db) / (8.314 * (T + 273.15))
+
+def liquidus_F(T, X_Nd, db=None):
+    return X_Nd - calc_X_Nd_Mg3Nd(T, db)
+
+#Pseudo-arclength continuation of func(T, X Nd, index) = 0 for a batch of curves, index picking each curve's parameters
+#Steps are taken in (T / T_scale, X Nd) so a unit of T and of X Nd weigh alike; h is the step length in those units
+#A curve ends at T_end, when X Nd leaves (0, 1), or when the step has to be cut below h_min
+#Every T in T_breaks (e.g. the tabulated temperatures, where the activities have kinks in T) is landed on exactly,
+#and so is every X Nd in X_breaks (e.g. the activity data points, where gamma has kinks in X Nd)
+#The turn test is on the X Nd error at fixed T (the chord deviation over the cosine of the slope), as boundary() reads it
+#Returns a list of (T, X Nd) arrays, one per curve, empty where the starting point is not on (0, 1)
+def trace(func, T_start, X_start, T_end, T_breaks=(), X_breaks=(), h=0.01, h_max=0.05, h_min=1e-6, T_scale=100, tol=1e-10,
+          chord_tol=1e-5, max_steps=100000):
+    T_start, X_start = np.broadcast_arrays(np.asarray(T_start, dtype=float), np.asarray(X_start, dtype=float))
+    n = len(T_start)
+    direction = np.sign(T_end - T_start[0]) if n else 1
+    s_end = T_end / T_scale
+    #Stops in the direction of travel, as direction * s so they always increase
+    stops = np.sort(direction * np.asarray(T_breaks, dtype=float) / T_scale)
+    stops = np.append(stops[stops < direction * s_end], direction * s_end)
+    X_breaks = np.sort(np.asarray(X_breaks, dtype=float))
+
+    s = T_start / T_scale
+    X = X_start.copy()
+    h = np.full(n, float(h))
+    alive = np.isfinite(X) & (X > 0) & (X < 1)
+    tangent = np.zeros((2, n))
+    history = [(np.flatnonzero(alive), s[alive] * T_scale, X[alive])]
+
+    def F(s, X, index):
+        return func(s * T_scale, X, index)
+
+    def gradient(s, X, index):
+        ds = 1e-6
+        dX = 1e-7 * np.maximum(X, 1e-6)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            F_s = (F(s + ds, X, index) - F(s - ds, X, index)) / (2 * ds)
+            F_X = (F(s, X + dX, index) - F(s, X - dX, index)) / (2 * dX)
+        return F_s, F_X
+
+    def unit_tangent(F_s, F_X, previous):
+        t = np.array([F_X, -F_s])
+        t /= np.hypot(*t)
+        #Keep going the same way: with the previous tangent, or towards T_end at the start
+        flip = np.where(np.any(previous != 0, axis=0), np.sum(t * previous, axis=0) < 0, direction * t[0] < 0)
+        return np.where(flip, -t, t)
+
+    index = np.flatnonzero(alive)
+    if len(index):
+        tangent[:, index] = unit_tangent(*gradient(s[index], X[index], index), tangent[:, index])
+
+    for step in range(max_steps):
+        index = np.flatnonzero(alive)
+        if not len(index):
+            break
+        t = tangent[:, index]
+        s_pred = s[index] + h[index] * t[0]
+        X_pred = X[index] + h[index] * t[1]
+
+        #Corrector: F = 0 and no movement along the tangent from the predicted point
+        s_new, X_new = s_pred.copy(), X_pred.copy()
+        converged = np.zeros(len(index), dtype=bool)
+        iterations = np.zeros(len(index), dtype=int)
+        for iteration in range(8):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                F_value = F(s_new, X_new, index)
+                F_s, F_X = gradient(s_new, X_new, index)
+                along = t[0] * (s_new - s_pred) + t[1] * (X_new - X_pred)
+                det = F_s * t[1] - F_X * t[0]
+                d_s = (-F_value * t[1] + F_X * along) / det
+                d_X = (-F_s * along + F_value * t[0]) / det
+            working = ~converged
+            s_new = np.where(working, s_new + d_s, s_new)
+            X_new = np.where(working, X_new + d_X, X_new)
+            iterations += working
+            converged |= np.isfinite(F_value) & (np.abs(F_value) < tol) & (np.abs(d_s) + np.abs(d_X) < 1e-10)
+            if converged.all():
+                break
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            F_s, F_X = gradient(s_new, X_new, index)
+            t_new = unit_tangent(F_s, F_X, t)
+        angle = np.arccos(np.clip(np.sum(t_new * t, axis=0), -1, 1))
+        #Steep stretches are held to the X Nd error, up to a slope of 10 (near vertical the T error is what's left)
+        cosine = np.maximum(np.minimum(np.abs(t[0]), np.abs(t_new[0])), 0.1)
+        turned = h[index] * angle / (8 * cosine) > chord_tol
+        #The turn misses curvature that changes along the step, so the curve is also solved at the middle T of the step
+        #(Newton in X Nd from the chord) and compared with the chord there
+        s_mid = 0.5 * (s[index] + s_new)
+        X_chord = 0.5 * (X[index] + X_new)
+        X_mid = X_chord.copy()
+        for iteration in range(4):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                X_mid = X_mid - F(s_mid, X_mid, index) / gradient(s_mid, X_mid, index)[1]
+        with np.errstate(invalid='ignore'):
+            turned |= np.abs(X_mid - X_chord) > chord_tol
+        ok = converged & np.isfinite(s_new) & np.isfinite(X_new) & ~(turned & (h[index] > 2 * h_min))
+        #Failed or turned too far: retry with half the step, or give up on the curve
+        retry = index[~ok]
+        h[retry] /= 2
+        alive[retry[h[retry] < h_min]] = False
+
+        accept = index[ok]
+        s_new, X_new, t_new, iterations = s_new[ok], X_new[ok], t_new[:, ok], iterations[ok]
+        inside = (X_new > 0) & (X_new < 1)
+        s_stop = direction * stops[np.minimum(np.searchsorted(stops, direction * s[accept], side='right'), len(stops) - 1)]
+        past_stop = direction * (s_new - s_stop) >= 0
+        #The first X break strictly between the old and new X Nd, if any, cut back to unless a T stop comes first
+        if len(X_breaks):
+            X_old, s_old = X[accept], s[accept]
+            rising = X_new > X_old
+            b = np.where(rising, np.searchsorted(X_breaks, X_old, side='right'), np.searchsorted(X_breaks, X_old, side='left') - 1)
+            X_cross = X_breaks[np.clip(b, 0, len(X_breaks) - 1)]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                crossed = (b >= 0) & (b < len(X_breaks)) & np.where(rising, X_cross <= X_new, X_cross >= X_new) & (X_new != X_old)
+                w_X = (X_cross - X_old) / (X_new - X_old)
+                w_T = (s_stop - s_old) / (s_new - s_old)
+            on_X = crossed & inside & ~(past_stop & (w_T <= w_X))
+            past_stop &= ~on_X
+            if on_X.any():
+                k = accept[on_X]
+                X_fixed = X_cross[on_X]
+                s_X = s_old[on_X] + w_X[on_X] * (s_new[on_X] - s_old[on_X])
+                for iteration in range(8):
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        s_X = s_X - F(s_X, X_fixed, k) / gradient(s_X, X_fixed, k)[0]
+                s_new[on_X] = s_X
+                X_new[on_X] = X_fixed
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    t_new[:, on_X] = unit_tangent(*gradient(s_X, X_fixed, k), t_new[:, on_X])
+                inside[on_X] &= np.isfinite(s_X)
+        past_end = past_stop & (s_stop == s_end)
+        #Steps over a stop are cut back to land on it, by Newton in X Nd at fixed T from the straight line
+        if past_stop.any():
+            k = accept[past_stop]
+            s_fixed = s_stop[past_stop]
+            w = (s_fixed - s[k]) / (s_new[past_stop] - s[k])
+            X_stop = X[k] + w * (X_new[past_stop] - X[k])
+            for iteration in range(8):
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    X_stop = X_stop - F(s_fixed, X_stop, k) / gradient(s_fixed, X_stop, k)[1]
+            s_new[past_stop] = s_fixed
+            X_new[past_stop] = X_stop
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_new[:, past_stop] = unit_tangent(*gradient(s_fixed, X_stop, k), t_new[:, past_stop])
+            inside[past_stop] &= np.isfinite(X_stop)
+        keep = inside
+        history.append((accept[keep], s_new[keep] * T_scale, X_new[keep]))
+        s[accept[keep]] = s_new[keep]
+        X[accept[keep]] = X_new[keep]
+        tangent[:, accept[keep]] = t_new[:, keep]
+        alive[accept[~keep | past_end]] = False
+        h[accept] = np.where(iterations <= 3, np.minimum(h[accept] * 1.5, h_max), h[accept] * 0.7)
+
+    curve_index = np.concatenate([part[0] for part in history])
+    T_all = np.concatenate([part[1] for part in history])
+    X_all = np.concatenate([part[2] for part in history])
+    order = np.argsort(curve_index, kind='stable')
+    bounds = np.searchsorted(curve_index[order], np.arange(n + 1))
+    return [(T_all[order][bounds[i]:bounds[i + 1]], X_all[order][bounds[i]:bounds[i + 1]]) for i in range(n)]
+
+#T where g(T, index) changes sign, bracketed on the sorted T_grid for every index and bisected on g
+#Returns (index, T) arrays of every crossing
+def find_crossings(g, T_grid, n_index, iterations=50):
+    T_grid = np.asarray(T_grid, dtype=float)
+    if len(T_grid) < 2 or not n_index:
+        return np.zeros(0, dtype=int), np.zeros(0)
+    index = np.repeat(np.arange(n_index), len(T_grid))
+    values = g(np.tile(T_grid, n_index), index).reshape(n_index, len(T_grid))
+    with np.errstate(invalid='ignore'):
+        sign_change = np.sign(values[:, :-1]) * np.sign(values[:, 1:]) < 0
+    i, j = np.nonzero(sign_change)
+    T_low, T_high = T_grid[j], T_grid[j + 1]
+    g_low = values[i, j]
+    for iteration in range(iterations):
+        T_mid = 0.5 * (T_low + T_high)
+        g_mid = g(T_mid, i)
+        same = np.sign(g_mid) == np.sign(g_low)
+        T_low = np.where(same, T_mid, T_low)
+        g_low = np.where(same, g_mid, g_low)
+        T_high = np.where(same, T_high, T_mid)
+    return i, 0.5 * (T_low + T_high)
+
+class RegionMap:
+    def __init__(self, P_H2, curves, intersections, critical_P_H2, is_ideal, db):
+        self.P_H2 = P_H2
+        self.curves = curves
+        self.intersections = intersections
+        self.critical_P_H2 = critical_P_H2
+        self.is_ideal = is_ideal
+        self.db = db
+
+    #X Nd on a traced boundary at temperature(s) T, linear between traced points, NaN off the traced range
+    #The hydride boundary needs one of the traced pressures
+    def boundary(self, name, T, P_H2=None):
+        if name == 'hydride':
+            matches = np.flatnonzero(np.isclose(self.P_H2, P_H2, rtol=1e-12, atol=0))
+            if not len(matches):
+                raise ValueError(f'no hydride boundary traced at P_H2 = {P_H2}, traced: {", ".join(f"{P:g}" for P in self.P_H2)}')
+            T_curve, X_curve = self.curves['hydride'][matches[0]]
+        else:
+            T_curve, X_curve = self.curves[name]
+        if not len(T_curve):
+            return np.full(np.shape(T), np.nan)
+        return np.interp(T, T_curve, X_curve, left=np.nan, right=np.nan)
+
+    #Region code of (T, X Nd, P_H2) points, the sum of region_flags of every boundary the point is past
+    #Evaluated from the exact boundary functions, so any point can be asked, not just traced pressures
+    def classify(self, T, X_Nd, P_H2=0):
+        T, X_Nd, P_H2 = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (T, X_Nd, P_H2)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            codes = np.where(reduction_F(T, X_Nd, self.is_ideal, self.db) >= 0, region_flags['reduction_stopped'], 0)
+            codes = codes + np.where((T <= np.max(liquidus_points(self.db)[0])) & (liquidus_F(T, X_Nd, self.db) >= 0), region_flags['Mg3Nd'], 0)
+            codes = codes + np.where((P_H2 > 0) & (hydride_F(T, X_Nd, P_H2, self.is_ideal, self.db) > 0), region_flags['NdH2'], 0)
+        return codes
+
+    #Crossings at one traced pressure plus the pressure independent ones
+    def intersections_at(self, P_H2):
+        return [crossing for crossing in self.intersections if crossing['P_H2'] is None or np.isclose(crossing['P_H2'], P_H2, rtol=1e-12, atol=0)]
+
+    def to_dict(self):
+        return {
+            'P_H2': self.P_H2.tolist(),
+            'is_ideal': self.is_ideal,
+            'reduction': {'T': self.curves['reduction'][0].tolist(), 'X_Nd': self.curves['reduction'][1].tolist()},
+            'Mg3Nd': {'T': self.curves['Mg3Nd'][0].tolist(), 'X_Nd': self.curves['Mg3Nd'][1].tolist()},
+            'hydride': [{'P_H2': float(P), 'T': T.tolist(), 'X_Nd': X.tolist()} for P, (T, X) in zip(self.P_H2, self.curves['hydride'])],
+            'intersections': self.intersections,
+            'critical_P_H2': {name: {'T': T.tolist(), 'P_H2': P.tolist()} for name, (T, P) in self.critical_P_H2.items()},
+        }
+
+    def region_names(self, code):
+        return [name for name, flag in region_flags.items() if code & flag] or ['liquid']
+
+#Traces every boundary over T_low-T_high (default: the tabulated temperatures) for each P_H2 and finds their crossings
+def build_region_map(P_H2, T_low=None, T_high=None, is_ideal='false', db=None, **trace_settings):
+    if db is None:
+        db = get_database()
+    P_H2 = np.atleast_1d(np.asarray(P_H2, dtype=float))
+    if (P_H2 <= 0).any():
+        raise ValueError('hydride boundaries need P_H2 above 0')
+    T_low = db.temps.min() if T_low is None else float(T_low)
+    T_high = db.temps.max() if T_high is None else float(T_high)
+    T_liquidus = liquidus_points(db)[0]
+    T_liq_low = max(T_low, np.min(T_liquidus))
+    T_liq_high = min(T_high, np.max(T_liquidus))
+
+    def X_Nd_Mg3Nd(T):
+        return calc_X_Nd_Mg3Nd(T, db)
+
+    def eq_comp(T):
+        return calc_eq_comp(is_ideal, db.Gf(T, 'Gf_MgO'), db.Gf(T, 'Gf_Nd2O3'), db.Gf(T, 'Gf_NdL'), T,
+                            analyses.iterations, analyses.precision, db)[0]
+
+    #Starting points from the ordinary solvers
+    T_0 = np.array([T_low])
+    reduction = trace(lambda T, X, i: reduction_F(T, X, is_ideal, db), T_0, eq_comp(T_0), T_high, db.temps, db.X_Nd_data,
+                      **trace_settings)[0]
+    if T_liq_low < T_liq_high:
+        liquidus = trace(lambda T, X, i: liquidus_F(T, X, db), [T_liq_low], X_Nd_Mg3Nd([T_liq_low]), T_liq_high,
+                         liquidus_breaks(db), **trace_settings)[0]
+    else:
+        liquidus = (np.zeros(0), np.zeros(0))
+    X_hyd_0 = calc_hyd_eq_comp(is_ideal, db.Gf(T_0, 'Gf_NdH2'), db.Gf(T_0, 'Gf_NdL'), T_0, P_H2, db)[0]
+    hydride = trace(lambda T, X, i: hydride_F(T, X, P_H2[i], is_ideal, db), np.full(len(P_H2), T_low), X_hyd_0, T_high,
+                    db.temps, db.X_Nd_data, **trace_settings)
+    curves = {'reduction': reduction, 'Mg3Nd': liquidus, 'hydride': hydride}
+
+    intersections = []
+
+    def add(boundaries, index, T, X_func, per_pressure):
+        for i, T_cross in zip(index, T):
+            intersections.append({
+                'boundaries': boundaries,
+                'P_H2': float(P_H2[i]) if per_pressure else None,
+                'T': float(T_cross),
+                'X_Nd': float(X_func(np.array([T_cross]))[0]),
+            })
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        #Reduction X Nd meets the liquidus: reduction F along the liquidus changes sign
+        index, T = find_crossings(lambda T, i: reduction_F(T, X_Nd_Mg3Nd(T), is_ideal, db), liquidus[0], 1)
+        add(('reduction', 'Mg3Nd'), index, T, X_Nd_Mg3Nd, False)
+        #Hydride boundary meets the liquidus, and the reduction X Nd, at each pressure
+        T_grid = np.unique(np.concatenate([T for T, X in hydride] + [np.zeros(0)]))
+        T_grid_liq = T_grid[(T_grid >= T_liq_low) & (T_grid <= T_liq_high)]
+        index, T = find_crossings(lambda T, i: hydride_F(T, X_Nd_Mg3Nd(T), P_H2[i], is_ideal, db), T_grid_liq, len(P_H2))
+        add(('hydride', 'Mg3Nd'), index, T, X_Nd_Mg3Nd, True)
+        T_grid_red = np.unique(np.concatenate([T_grid, reduction[0]]))
+        index, T = find_crossings(lambda T, i: hydride_F(T, eq_comp(T), P_H2[i], is_ideal, db), T_grid_red, len(P_H2))
+        add(('hydride', 'reduction'), index, T, eq_comp, True)
+    intersections.sort(key=lambda crossing: (crossing['P_H2'] or 0, crossing['T']))
+
+    #Lowest P_H2 that precipitates NdH2 at the reduction X Nd and on the liquidus, along those curves
+    critical_P_H2 = {}
+    for name, (T, X) in (('reduction', reduction), ('Mg3Nd', liquidus)):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            critical_P_H2[name] = (T, np.exp(-hydride_F(T, X, 1, is_ideal, db)))
+
+    return RegionMap(P_H2, curves, intersections, critical_P_H2, is_ideal, db)
@@ -0,0 +1,120 @@
+#PLOTTING
+#Each function draws one manuscript figure onto a matplotlib axes from the results of the analyses module
+#i picks the temperature row for the per-temperature figures
+#X_Nd_Mg3Nd is the Mg3Nd liquidus X Nd at each temperature row, e.g. calc_X_Nd_Mg3Nd(reduction['T'], db),
+#so the figures take it from the caller's database
+
+#Interpolated activity
+def plot_activity(activity, i, ax):
+    T = activity['T'][i]
+    ax.plot(activity['X_Nd'], activity['a_Nd'][i], '-', label='Interpolated Nd Activity')
+    ax.plot(activity['X_Nd'], activity['a_Mg'][i], '-', label='Interpolated Mg Activity')
+    ax.plot(activity['X_Nd_data'], activity['a_Nd_data'][i], 'o', label='Nd Activity Data')
+    ax.plot(activity['X_Nd_data'], activity['a_Mg_data'][i], 'o', label='Mg Activity Data')
+    ax.set_xlabel('Mole Fraction Nd')
+    ax.set_ylabel('Activity')
+    ax.set_title(f'Interpolation of Activity at {T:g}')
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.legend()
+    ax.grid()
+
+#Interpolated activity coefficients
+def plot_activity_coefficient(activity, i, ax):
+    T = activity['T'][i]
+    ax.plot(activity['X_Nd'], activity['gamma_Nd'][i], '-', label='Nd Activity')
+    ax.plot(activity['X_Nd'], activity['gamma_Mg'][i], '-', label='Mg Activity')
+    ax.plot(activity['X_Nd_data'], activity['gamma_Nd_data'][i], 'o', label='Nd Activity Data')
+    ax.plot(activity['X_Nd_data'], activity['gamma_Mg_data'][i], 'o', label='Mg Activity Data')
+    ax.set_xlabel('Mole Fraction Nd')
+    ax.set_ylabel('Activity Coefficient')
+    ax.set_title(f'Interpolation of Activity Coefficient at {T:g}')
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.legend()
+    ax.grid()
+
+#Interpolated Mg3Nd liquidus
+def plot_liquidus(liquidus, ax):
+    ax.plot(liquidus['X_Nd'], liquidus['T'], '-', label='Interpolated')
+    ax.plot(liquidus['X_Nd_data'], liquidus['T_data'], 'o', label='Data')
+    ax.set_xlabel('Mole Fraction Nd')
+    ax.set_ylabel('T (C)')
+    ax.set_title('Interpolation of Mg3Nd Liquidus')
+    ax.set_xlim(0, 0.3)
+    ax.set_ylim(650, 850)
+    ax.legend()
+    ax.grid()
+
+#Equilibrium composition as a function of T, reduction_points are drawn as markers on top of the reduction curves
+def plot_eq_comp_vs_T(reduction, liquidus, ax, reduction_points=None):
+    ax.plot(reduction['T'], reduction['X_Nd_eq_ideal'], '-', label='Ideal Solution')
+    ax.plot(reduction['T'], reduction['X_Nd_eq_nonideal'], '-', label='Non-Ideal Solution')
+    if reduction_points is not None:
+        ax.plot(reduction_points['T'], reduction_points['X_Nd_eq_ideal'], 'o', color='C0')
+        ax.plot(reduction_points['T'], reduction_points['X_Nd_eq_nonideal'], 'o', color='C1')
+    ax.plot(liquidus['T'], liquidus['X_Nd'], '-', label='Mg3Nd Forms')
+    ax.set_xlabel('T (C)')
+    ax.set_ylabel('Equilibrium X Nd')
+    ax.set_title('Equilibrium Composition vs. Temperature')
+    ax.set_xlim(650, 850)
+    ax.set_ylim(0, 0.25)
+    ax.legend()
+    ax.grid()
+
+#Reduction delta G as a function of X Nd
+def plot_delta_G(delta_G, liquidus, i, ax):
+    T = delta_G['T'][i]
+    ax.plot(delta_G['X_Nd'], delta_G['delta_G_ideal'][i], '-', label='Ideal Solution')
+    ax.plot(delta_G['X_Nd'], delta_G['delta_G_nonideal'][i], '-', label='Non-Ideal Solution')
+    ax.plot(liquidus['T'], liquidus['X_Nd'], '-', label='Mg3Nd Forms')
+    ax.set_xlabel('X Nd')
+    ax.set_ylabel('Delta G (J/mol of Nd2O3)')
+    ax.set_title(f'Free Energy vs. Composition at {T:g}')
+    ax.set_xlim(0, 1)
+    ax.set_ylim(-250000, 250000)
+    ax.legend()
+    ax.grid()
+
+#X Nd at full reduction against the equilibrium and Mg3Nd compositions
+def plot_reactant_ratio(reactant_ratio, reduction, X_Nd_Mg3Nd, i, ax):
+    T = reduction['T'][i]
+    ax.plot(reactant_ratio['Nd2O3_i'], reactant_ratio['X_Nd_full_red'], '-', label='X Nd at Full Reduction')
+    ax.set_xlabel('Fraction of Stoichiometric Ratio')
+    ax.axhline(reduction['X_Nd_eq_ideal'][i], color='green', label="Eq. X Nd, Ideal")
+    ax.axhline(reduction['X_Nd_eq_nonideal'][i], color='orange', label="Eq. X Nd, Non-Ideal")
+    ax.axhline(X_Nd_Mg3Nd[i], color='red', label="Mg3Nd Forms")
+    ax.set_ylabel('X Nd')
+    ax.set_title(f'X Nd vs. Fraction of Stoichiometric Ratio at {T:g}')
+    ax.set_xlim(0, 0.4)
+    ax.set_ylim(0, 0.3)
+    ax.legend()
+    ax.grid()
+
+#Hydride precipitation delta G as a function of X Nd
+def plot_hyd_delta_G(hyd_delta_G, liquidus, i, ax):
+    T = hyd_delta_G['T'][i]
+    ax.plot(hyd_delta_G['X_Nd'], hyd_delta_G['hyd_delta_G_ideal'][i], '-', label='Ideal Solution')
+    ax.plot(hyd_delta_G['X_Nd'], hyd_delta_G['hyd_delta_G_nonideal'][i], '-', label='Non-Ideal Solution')
+    ax.plot(liquidus['T'], liquidus['X_Nd'], '-', label='Mg3Nd Forms')
+    ax.set_xlabel('X Nd')
+    ax.set_ylabel('Delta G (J/mol of Nd2O3)')
+    ax.set_title(f'Free Energy vs. Composition at {T:g}')
+    ax.set_xlim(0, 1)
+    ax.set_ylim(-250000, 250000)
+    ax.legend()
+    ax.grid()
+
+#Equilibrium hydriding X Nd as a function of H2 pressure
+def plot_hydride(hydride, X_Nd_Mg3Nd, i, ax):
+    T = hydride['T'][i]
+    ax.plot(hydride['P_H2'], hydride['X_Nd_eq_hyd_ideal'][i], '-', label='Ideal Solution')
+    ax.plot(hydride['P_H2'], hydride['X_Nd_eq_hyd_nonideal'][i], '-', label='Non-Ideal Solution')
+    ax.set_xlabel('P H2')
+    ax.set_ylabel('Equilibrium X Nd')
+    ax.axhline(X_Nd_Mg3Nd[i], color='red', label="Mg3Nd Forms")
+    ax.set_title(f'Equilibrium Composition vs. H2 Pressure at {T:g}')
+    ax.set_xlim(0, 1.1)
+    ax.set_ylim(0, 0.1)
+    ax.legend()
+    ax.grid()
@@ -0,0 +1,137 @@
+import json
+
+import numpy as np
+
+from .solvers import find_root
+from .thermo import ThermoDatabase, get_database
+
+#REACTION DEFINITIONS
+#A reaction system is a binary solute-solvent liquid (e.g. Nd in Mg) described by a ThermoDatabase,
+#a table of species and any number of reactions written as stoichiometry, products positive and reactants negative
+#Each species is (Gf name or None for Gf = 0, kind) where kind is
+#    'solute' / 'solvent': dissolved in the liquid, activity X * gamma from the database
+#    'gas': activity is its partial pressure
+#    'pure': condensed phase, activity 1
+#so for any reaction delta G = sum(nu * Gf) + RT * sum(nu * ln a), evaluated for whole arrays of T, X and P at once
+#Equilibrium compositions (delta G = 0) go through the same batched find_root as calc_eq_comp,
+#and the activities through the database's cached interpolants
+#Only Mg-Nd ships with data; other RE-Mg systems are loaded from a definition file (see load_system)
+
+#Mg-Nd species, the Gf of liquid Nd is 'Gf_NdL' and Mg(l) is the reference state
+mg_nd_species = {
+    'Nd2O3': ('Gf_Nd2O3', 'pure'),
+    'MgO': ('Gf_MgO', 'pure'),
+    'NdH2': ('Gf_NdH2', 'pure'),
+    'Nd': ('Gf_NdL', 'solute'),
+    'Mg': (None, 'solvent'),
+    'H2': (None, 'gas'),
+}
+
+mg_nd_reactions = {
+    #Nd2O3 + 3 Mg = 2 Nd + 3 MgO, the same delta G as calc_delta_G
+    'reduction': {'Nd2O3': -1, 'Mg': -3, 'Nd': 2, 'MgO': 3},
+    #Nd + H2 = NdH2, the same equilibrium as calc_hyd_eq_comp
+    'hydride': {'Nd': -1, 'H2': -1, 'NdH2': 1},
+}
+
+class Reaction:
+    def __init__(self, name, stoichiometry, species):
+        self.name = name
+        self.stoichiometry = dict(stoichiometry)
+        missing = [name for name in self.stoichiometry if name not in species]
+        if missing:
+            raise ValueError(f'Reaction {name!r} uses species with no definition: {", ".join(missing)}')
+        #Collected once, so evaluating the reaction is just a few array operations
+        self.Gf_terms = [(species[name][0], nu) for name, nu in self.stoichiometry.items() if species[name][0] is not None]
+        kinds = {kind: 0 for kind in ('solute', 'solvent', 'gas', 'pure')}
+        for name, nu in self.stoichiometry.items():
+            kinds[species[name][1]] += nu
+        self.nu_solute = kinds['solute']
+        self.nu_solvent = kinds['solvent']
+        self.nu_gas = kinds['gas']
+
+    def __repr__(self):
+        reactants = ' + '.join(f'{-nu:g} {name}' for name, nu in self.stoichiometry.items() if nu < 0)
+        products = ' + '.join(f'{nu:g} {name}' for name, nu in self.stoichiometry.items() if nu > 0)
+        return f'Reaction({self.name!r}: {reactants} = {products})'
+
+class ReactionSystem:
+    def __init__(self, db, species, reactions):
+        self.db = db
+        self.species = dict(species)
+        self.reactions = {name: Reaction(name, stoichiometry, self.species) for name, stoichiometry in reactions.items()}
+
+    def __repr__(self):
+        return f'ReactionSystem({"-".join(reversed(self.db.species))}: {", ".join(self.reactions)})'
+
+    #Standard delta G of a reaction (J/mol of reaction as written) at temperature(s) T
+    def standard_delta_G(self, reaction, T):
+        reaction = self.reactions[reaction]
+        T = np.asarray(T, dtype=float)
+        return sum(nu * self.db.Gf(T, Gf_name) for Gf_name, nu in reaction.Gf_terms)
+
+    #Delta G of a reaction at solute mole fraction X and temperature(s) T, P the partial pressure of any gas taking part
+    def delta_G(self, reaction, X, T, is_ideal='false', P=1):
+        standard = self.standard_delta_G(reaction, T)
+        reaction = self.reactions[reaction]
+        T = np.asarray(T, dtype=float)
+        X = np.asarray(X, dtype=float)
+        solute, solvent = self.db.species
+        ln_a = 0
+        if reaction.nu_solute:
+            ln_a = ln_a + reaction.nu_solute * np.log(self.db.activity(T, X, solute, is_ideal))
+        if reaction.nu_solvent:
+            ln_a = ln_a + reaction.nu_solvent * np.log(self.db.activity(T, X, solvent, is_ideal))
+        if reaction.nu_gas:
+            ln_a = ln_a + reaction.nu_gas * np.log(P)
+        return standard + 8.314 * (T + 273.15) * ln_a
+
+    #Solute mole fraction where the reaction is at equilibrium, for whole arrays of T (and P) at once
+    #Returns X and whether each element converged; X is NaN where delta G has the same sign over the whole (0, 1) range
+    def eq_comp(self, reaction, T, is_ideal='false', P=1, iterations=100, precision=0.000001):
+        nu = self.reactions[reaction].nu_solute - self.reactions[reaction].nu_solvent
+        if nu == 0:
+            raise ValueError(f'Reaction {reaction!r} does not depend on the liquid composition')
+        #find_root needs delta G increasing with X, which it is when the solute is made and the solvent used up
+        sign = 1 if nu > 0 else -1
+        T, P = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P, dtype=float))
+        X_low = np.full(T.shape, 1E-12)
+        X_high = np.full(T.shape, 1 - 1E-12)
+
+        def delta_G_func(X):
+            return sign * self.delta_G(reaction, X, T, is_ideal, P)
+
+        return find_root(delta_G_func, X_low, X_high, iterations, precision)
+
+#Built-in Mg-Nd system from the data module
+def mg_nd_system(db=None):
+    if db is None:
+        db = get_database()
+    return ReactionSystem(db, mg_nd_species, mg_nd_reactions)
+
+#Reaction system from a definition dict or JSON file, e.g. for Dy-Mg:
+#    {"species": ["Dy", "Mg"],
+#     "X_data": [...], solute mole fractions of the activity data
+#     "X_solvent_data": [...], optional, defaults to 1 - X_data with 1e-12 in place of 0 like the Mg-Nd data
+#     "data": {"700": {"Gf_Dy2O3": ..., "Gf_DyL": ..., "Gf_MgO": ..., "a_Dy": [...], "a_Mg": [...]}, ...},
+#     "species_table": {"Dy2O3": ["Gf_Dy2O3", "pure"], "Dy": ["Gf_DyL", "solute"], "Mg": [null, "solvent"], ...},
+#     "reactions": {"reduction": {"Dy2O3": -1, "Mg": -3, "Dy": 2, "MgO": 3}}}
+#Temperatures are in degrees C and the data must come from the user, nothing is filled in
+def load_system(definition):
+    if isinstance(definition, str):
+        with open(definition) as f:
+            definition = json.load(f)
+    data = {float(T): {name: np.asarray(value, dtype=float) for name, value in values.items()}
+            for T, values in definition['data'].items()}
+    data = dict(sorted(data.items()))
+    X_data = np.asarray(definition['X_data'], dtype=float)
+    X_solvent_data = np.asarray(definition.get('X_solvent_data', np.maximum(1 - X_data, 1E-12)), dtype=float)
+    db = ThermoDatabase(data, X_data, X_solvent_data, tuple(definition['species']))
+    species = {name: tuple(spec) for name, spec in definition['species_table'].items()}
+    return ReactionSystem(db, species, definition['reactions'])
+
+#Equilibrium solute mole fraction of one reaction for several systems, e.g. {'Mg-Nd': mg_nd_system(), 'Mg-Dy': load_system(...)}
+#Returns {system name: X array over temps}, NaN where a system has no equilibrium in the liquid
+def screen_systems(systems, reaction, temps, is_ideal='false', P=1):
+    temps = np.asarray(temps, dtype=float)
+    return {name: system.eq_comp(reaction, temps, is_ideal, P)[0] for name, system in systems.items()}
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import hash_value
+from .thermo import calc_X_Nd_Mg3Nd
+
+#FIGURE RENDERING
+#Headless rendering of the manuscript figures from the results of analyses.calc_all
+#One job per temperature and plot type, fanned out over a process pool using the Agg backend
+#Each job is hashed from its input arrays and the plotting code, and skipped if the files from the last run are still current
+#Everything a figure draws is worked out here and passed in its job, so workers never look up a database of their own
+
+manifest_name = '.render_manifest.json'
+
+#Keys that hold one row per temperature in each result family, everything else is shared by all temperatures
+row_keys = {
+    'activity': ('T', 'gamma_Nd', 'gamma_Mg', 'a_Nd', 'a_Mg', 'gamma_Nd_data', 'gamma_Mg_data', 'a_Nd_data', 'a_Mg_data'),
+    'reduction': ('T', 'X_Nd_eq_ideal', 'X_Nd_eq_nonideal', 'converged_ideal', 'converged_nonideal'),
+    'delta_G': ('T', 'delta_G_ideal', 'delta_G_nonideal'),
+    'hyd_delta_G': ('T', 'hyd_delta_G_ideal', 'hyd_delta_G_nonideal'),
+    'hydride': ('T', 'X_Nd_eq_hyd_ideal', 'X_Nd_eq_hyd_nonideal'),
+}
+
+#Result family for temperature row i only, so each job carries (and hashes) just the data it draws
+def _select_row(results, family, i):
+    return {key: value[i:i + 1] if key in row_keys[family] else value for key, value in results[family].items()}
+
+#List of (file stem, plot function name, positional inputs, keyword inputs) for every figure the results can make
+#db is the database the results came from, for the Mg3Nd liquidus lines (the default database when left out)
+def figure_jobs(results, db=None):
+    jobs = []
+    if 'liquidus' in results:
+        jobs.append(('liquidus', 'plot_liquidus', (results['liquidus'],), {}))
+    if 'reduction' in results and 'liquidus' in results:
+        if 'reduction_fine' in results:
+            jobs.append(('eq_comp_vs_T', 'plot_eq_comp_vs_T', (results['reduction_fine'], results['liquidus']), {'reduction_points': results['reduction']}))
+        else:
+            jobs.append(('eq_comp_vs_T', 'plot_eq_comp_vs_T', (results['reduction'], results['liquidus']), {}))
+
+    per_temperature = [
+        ('activity', 'plot_activity', 'activity', ()),
+        ('activity_coefficient', 'plot_activity_coefficient', 'activity', ()),
+        ('delta_G', 'plot_delta_G', 'delta_G', ('liquidus',)),
+        ('reactant_ratio', 'plot_reactant_ratio', 'reduction', ('reactant_ratio',)),
+        ('hyd_delta_G', 'plot_hyd_delta_G', 'hyd_delta_G', ('liquidus',)),
+        ('hydride', 'plot_hydride', 'hydride', ()),
+    ]
+    for stem, plot_name, family, shared in per_temperature:
+        if family not in results or any(name not in results for name in shared):
+            continue
+        if plot_name in ('plot_reactant_ratio', 'plot_hydride'):
+            X_Nd_Mg3Nd = calc_X_Nd_Mg3Nd(results[family]['T'], db)
+        for i, T in enumerate(results[family]['T']):
+            row = _select_row(results, family, i)
+            #plot_reactant_ratio takes the shared reactant ratio curve before the reduction row
+            if plot_name == 'plot_reactant_ratio':
+                args = (results['reactant_ratio'], row, X_Nd_Mg3Nd[i:i + 1], 0)
+            elif plot_name == 'plot_hydride':
+                args = (row, X_Nd_Mg3Nd[i:i + 1], 0)
+            else:
+                args = (row,) + tuple(results[name] for name in shared) + (0,)
+            jobs.append((f'{stem}_{T:g}', plot_name, args, {}))
+    return jobs
+
+#Hash of everything that goes into a figure: inputs, output settings and the plotting code itself
+def job_hash(job, formats, dpi):
+    from . import plots
+    stem, plot_name, args, kwargs = job
+    h = hashlib.sha256()
+    with open(plots.__file__, 'rb') as f:
+        h.update(f.read())
+    h.update(f'{plot_name}|{",".join(formats)}|{dpi}'.encode())
+    hash_value(h, args)
+    hash_value(h, kwargs)
+    return h.hexdigest()
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+#Draws one figure and writes it in every format, runs inside a worker process
+def _render_job(job, output_dir, formats, dpi):
+    from matplotlib.figure import Figure
+    from . import plots
+    stem, plot_name, args, kwargs = job
+    fig = Figure()
+    ax = fig.subplots()
+    getattr(plots, plot_name)(*args, ax=ax, **kwargs)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f'{stem}.{fmt}')
+        fig.savefig(path, format=fmt, dpi=dpi)
+        paths.append(path)
+    return paths
+
+def _load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, manifest_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, manifest_name)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+#Renders every figure from results into output_dir as e.g. hydride_700.png, skipping figures whose inputs are unchanged
+#workers=1 renders in this process (no pyplot needed either way), otherwise a process pool with that many workers (None = one per CPU)
+#db is the database the results came from, the default database when left out
+#Returns the lists of written and skipped file stems
+def render_figures(results, output_dir, formats=('png',), workers=None, dpi=150, force=False, db=None):
+    os.makedirs(output_dir, exist_ok=True)
+    formats = tuple(formats)
+    manifest = _load_manifest(output_dir)
+
+    todo = []
+    skipped = []
+    for job in figure_jobs(results, db):
+        stem = job[0]
+        digest = job_hash(job, formats, dpi)
+        current = all(os.path.exists(os.path.join(output_dir, f'{stem}.{fmt}')) for fmt in formats)
+        if not force and current and manifest.get(stem) == digest:
+            skipped.append(stem)
+        else:
+            todo.append((job, digest))
+
+    try:
+        if workers == 1 or len(todo) <= 1:
+            for job, digest in todo:
+                _render_job(job, output_dir, formats, dpi)
+                manifest[job[0]] = digest
+        elif todo:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                futures = [(job, digest, executor.submit(_render_job, job, output_dir, formats, dpi)) for job, digest in todo]
+                for job, digest, future in futures:
+                    future.result()
+                    manifest[job[0]] = digest
+    finally:
+        #Figures finished before a failure still count as current next time
+        _save_manifest(output_dir, manifest)
+
+    return [job[0] for job, digest in todo], skipped
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from . import analyses
+from .design import calc_Nd2O3_full_red, calc_X_Nd_full_red, limit_names
+from .solvers import calc_eq_comp, calc_hyd_eq_comp
+from .thermo import calc_X_Nd_Mg3Nd, get_database, set_database
+
+#QUERY SERVICE
+#Local HTTP/JSON service around the equilibrium solvers for the MES and furnace controllers, standard library only
+#    POST /query  {"T": 750, "P_H2": 0.5, "model": "nonideal", "ratio": 0.2}  or  {"queries": [{...}, {...}]}
+#    POST /sweep  {"temps": [...], "P_H2": [...], "model": "nonideal"}, whole (T, P_H2) grids
+#    GET /health, GET /stats
+#Each query gives the equilibrium reduction X Nd, the Mg3Nd liquidus X Nd and, with P_H2 > 0, the equilibrium hydriding X Nd
+#With a charge ratio (mol Nd2O3 per 3 mol Mg, as in design) it also gives the Nd recovery, final X Nd and the limit that stops it
+#Queries arriving within batch_window seconds of each other are solved together in one vectorized call,
+#identical queries already being solved wait on the same result, and answered queries are kept in an in-memory LRU
+#Batches bigger than pool_threshold points and every sweep go to a process pool so the event loop keeps answering;
+#its workers are spawned rather than forked, so they never inherit the listening socket or open connections
+#    python -m mgnd serve --port 8750
+#    curl -d '{"T": 750, "P_H2": 0.5, "ratio": 0.2}' localhost:8750/query
+
+models = {'nonideal': 'false', 'ideal': 'true'}
+max_body_bytes = 64 * 1024**2
+
+#Results for arrays of points, all of one model; P_H2 NaN or <= 0 means no hydrogen, ratio NaN means no charge given
+def solve_points(T, P_H2, ratio, is_ideal, db=None):
+    if db is None:
+        db = get_database()
+    T = np.asarray(T, dtype=float)
+    P_H2 = np.asarray(P_H2, dtype=float)
+    ratio = np.asarray(ratio, dtype=float)
+
+    T_unique, inverse = np.unique(T, return_inverse=True)
+    X_Nd_eq = calc_eq_comp(is_ideal, db.Gf(T_unique, 'Gf_MgO'), db.Gf(T_unique, 'Gf_Nd2O3'), db.Gf(T_unique, 'Gf_NdL'),
+                           T_unique, analyses.iterations, analyses.precision, db)[0][inverse]
+    X_Nd_Mg3Nd = calc_X_Nd_Mg3Nd(T_unique, db)[inverse]
+
+    #calc_hyd_eq_comp solves a (T, P_H2) grid, so each point's pressure is folded into its Gf_NdH2
+    #(a Nd = exp((Gf_NdH2 - RT ln P_H2 - Gf_NdL) / RT)), which gives one column of point by point results
+    X_Nd_hyd = np.full(T.shape, np.inf)
+    has_H2 = P_H2 > 0
+    if has_H2.any():
+        T_H2 = T[has_H2]
+        Gf_NdH2 = db.Gf(T_H2, 'Gf_NdH2') - 8.314 * (T_H2 + 273.15) * np.log(P_H2[has_H2])
+        X_Nd_hyd[has_H2] = calc_hyd_eq_comp(is_ideal, Gf_NdH2, db.Gf(T_H2, 'Gf_NdL'), T_H2, 1, db)[:, 0]
+
+    results = {'X_Nd_eq': X_Nd_eq, 'X_Nd_Mg3Nd': X_Nd_Mg3Nd, 'X_Nd_hyd': X_Nd_hyd}
+    #Recovery is capped by the lowest limit, like operating_window
+    limits = np.stack([X_Nd_eq, X_Nd_Mg3Nd, X_Nd_hyd])
+    X_Nd_lim = np.clip(np.min(limits, axis=0), 0, None)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        recovery = np.minimum(calc_Nd2O3_full_red(X_Nd_lim) / ratio, 1)
+    results['recovery'] = recovery
+    results['X_Nd'] = calc_X_Nd_full_red(recovery * ratio)
+    results['limit'] = np.where(recovery < 1, np.argmin(limits, axis=0), -1)
+    return results
+
+#Whole (T, P_H2) grid of one model, the same as the reduction and hydride analyses
+def solve_sweep(temps, P_H2, is_ideal, db=None):
+    suffix = 'ideal' if is_ideal == 'true' else 'nonideal'
+    results = {
+        'T': np.asarray(temps, dtype=float),
+        'X_Nd_eq': analyses.calc_reduction(temps, db)[f'X_Nd_eq_{suffix}'],
+        'X_Nd_Mg3Nd': calc_X_Nd_Mg3Nd(np.asarray(temps, dtype=float), db),
+    }
+    if P_H2 is not None:
+        results['P_H2'] = np.asarray(P_H2, dtype=float)
+        results['X_Nd_hyd'] = analyses.calc_hydride(temps, P_H2, db)[f'X_Nd_eq_hyd_{suffix}']
+    return results
+
+#JSON has no NaN or infinity, those become null
+def _to_json(values):
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 0:
+        value = float(values)
+        return value if math.isfinite(value) else None
+    return [_to_json(value) for value in values]
+
+def _number(query, name, required=False):
+    value = query.get(name)
+    if value is None:
+        if required:
+            raise ValueError(f'{name} is required')
+        return math.nan
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f'{name} must be a number, not {value!r}')
+    return float(value)
+
+#Cache key for one query: (T, P_H2, model, ratio), NaN where not given
+def _query_key(query):
+    if not isinstance(query, dict):
+        raise ValueError(f'a query must be a JSON object, not {query!r}')
+    model = query.get('model', 'nonideal')
+    if model not in models:
+        raise ValueError(f"model must be one of {', '.join(models)}, not {model!r}")
+    T = _number(query, 'T', required=True)
+    P_H2 = _number(query, 'P_H2')
+    ratio = _number(query, 'ratio')
+    if not math.isfinite(T):
+        raise ValueError('T must be finite')
+    if P_H2 < 0:
+        raise ValueError('P_H2 must be 0 or more')
+    if not (math.isnan(ratio) or 0 < ratio <= 1):
+        raise ValueError('ratio must be in (0, 1]')
+    #nan != nan, so missing values are keyed as None
+    return (T, None if math.isnan(P_H2) else P_H2, model, None if math.isnan(ratio) else ratio)
+
+def _init_worker(db):
+    if db is not None:
+        set_database(db)
+
+class EquilibriumService:
+    def __init__(self, db=None, cache_size=100000, batch_window=0.001, max_batch=4096, pool_threshold=2000, workers=None):
+        self.db = db
+        self.cache_size = cache_size
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.pool_threshold = pool_threshold
+        self.workers = workers
+        self.results = OrderedDict()
+        #Futures of queries waiting to be solved or being solved, and the keys not handed to a batch yet
+        self.pending = {}
+        self.queued = []
+        self._flush_handle = None
+        self._pool = None
+        #Running batch tasks, held here so none is garbage collected before it finishes
+        self._tasks = set()
+        self.counters = {'queries': 0, 'cache_hits': 0, 'coalesced': 0, 'solved': 0, 'batches': 0, 'pool_jobs': 0}
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_worker, initargs=(self.db,))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    #func(*args) in the process pool; a pool broken by a dead worker is dropped and the job tried once on a new one,
+    #so only this job fails if that breaks too and later jobs still get a working pool
+    async def _run_in_pool(self, func, *args):
+        self.counters['pool_jobs'] += 1
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+            except BrokenProcessPool:
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                if attempt:
+                    raise
+
+    def _start_solve(self, keys):
+        task = asyncio.get_running_loop().create_task(self._solve(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _remember(self, key, result):
+        self.results[key] = result
+        if len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+
+    #Answers for a list of queries (dicts), in the same order
+    async def query(self, queries):
+        keys = [_query_key(query) for query in queries]
+        loop = asyncio.get_running_loop()
+        answers = []
+        new = []
+        for key in keys:
+            self.counters['queries'] += 1
+            if key in self.results:
+                self.counters['cache_hits'] += 1
+                self.results.move_to_end(key)
+                answers.append(self.results[key])
+            elif key in self.pending:
+                self.counters['coalesced'] += 1
+                answers.append(self.pending[key])
+            else:
+                future = loop.create_future()
+                self.pending[key] = future
+                new.append(key)
+                answers.append(future)
+
+        if len(new) > self.pool_threshold:
+            #A big batch of its own goes straight out instead of holding up the small ones
+            self._start_solve(new)
+        elif new:
+            self.queued.extend(new)
+            if len(self.queued) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        #Awaited together, so when one batch fails the exceptions of the others are still retrieved
+        solved = iter(await asyncio.gather(*[answer for answer in answers if isinstance(answer, asyncio.Future)]))
+        return [next(solved) if isinstance(answer, asyncio.Future) else answer for answer in answers]
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self.queued = self.queued, []
+        if batch:
+            self._start_solve(batch)
+
+    #Solves a batch of keys, one vectorized call per model, and hands the results to everything waiting on them
+    async def _solve(self, keys):
+        self.counters['batches'] += 1
+        self.counters['solved'] += len(keys)
+        try:
+            for model, is_ideal in models.items():
+                model_keys = [key for key in keys if key[2] == model]
+                if not model_keys:
+                    continue
+                T, P_H2, ratio = (np.array([math.nan if key[i] is None else key[i] for key in model_keys], dtype=float)
+                                  for i in (0, 1, 3))
+                if len(model_keys) > self.pool_threshold:
+                    results = await self._run_in_pool(solve_points, T, P_H2, ratio, is_ideal)
+                else:
+                    results = solve_points(T, P_H2, ratio, is_ideal, self.db)
+                for i, key in enumerate(model_keys):
+                    result = {'T': key[0], 'P_H2': key[1], 'model': model, 'ratio': key[3],
+                              'X_Nd_eq': _to_json(results['X_Nd_eq'][i]),
+                              'X_Nd_Mg3Nd': _to_json(results['X_Nd_Mg3Nd'][i]),
+                              'X_Nd_hyd': _to_json(results['X_Nd_hyd'][i])}
+                    if key[3] is not None:
+                        result['recovery'] = _to_json(results['recovery'][i])
+                        result['X_Nd'] = _to_json(results['X_Nd'][i])
+                        limit = int(results['limit'][i])
+                        result['limit'] = limit_names[limit] if limit >= 0 else None
+                    self._remember(key, result)
+                    self.pending.pop(key).set_result(result)
+        except Exception as error:
+            for key in keys:
+                future = self.pending.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(error)
+
+    #Whole (T, P_H2) grid, always solved in the process pool
+    async def sweep(self, request):
+        if not isinstance(request, dict):
+            raise ValueError(f'a sweep must be a JSON object, not {request!r}')
+        model = request.get('model', 'nonideal')
+        if model not in models:
+            raise ValueError(f"model must be one of {', '.join(models)}, not {model!r}")
+        temps = np.asarray(request.get('temps', []), dtype=float)
+        if temps.ndim != 1 or not len(temps):
+            raise ValueError('temps must be a non-empty list of numbers')
+        P_H2 = request.get('P_H2')
+        if P_H2 is not None:
+            P_H2 = np.asarray(P_H2, dtype=float)
+            if P_H2.ndim != 1 or not len(P_H2) or (P_H2 <= 0).any():
+                raise ValueError('P_H2 must be a non-empty list of pressures above 0')
+        results = await self._run_in_pool(solve_sweep, temps, P_H2, models[model])
+        return {name: _to_json(values) for name, values in results.items()}
+
+    def stats(self):
+        return {**self.counters, 'cached': len(self.results), 'pending': len(self.pending)}
+
+    #(status, JSON payload) for one HTTP request
+    async def dispatch(self, method, path, body):
+        path = path.split('?')[0]
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        if method != 'POST' or path not in ('/query', '/sweep'):
+            return 404, {'error': f'no route for {method} {path}'}
+        try:
+            request = json.loads(body)
+            if path == '/sweep':
+                return 200, await self.sweep(request)
+            if isinstance(request, dict) and 'queries' in request:
+                if not isinstance(request['queries'], list):
+                    raise ValueError('queries must be a list')
+                return 200, {'results': await self.query(request['queries'])}
+            return 200, (await self.query([request]))[0]
+        except (ValueError, TypeError) as error:
+            return 400, {'error': str(error)}
+
+    #HTTP/1.1 with keep-alive, so a controller can hold one connection open and send query after query
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > max_body_bytes:
+                    status, payload = 413, {'error': f'request body over {max_body_bytes} bytes'}
+                    headers['connection'] = 'close'
+                else:
+                    body = await reader.readexactly(length)
+                    try:
+                        status, payload = await self.dispatch(method, path, body)
+                    except Exception as error:
+                        status, payload = 500, {'error': f'{type(error).__name__}: {error}'}
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload).encode()
+                writer.write((f'HTTP/1.1 {status} {_reasons[status]}\r\nContent-Type: application/json\r\n'
+                              f'Content-Length: {len(data)}\r\nConnection: {"keep-alive" if keep_alive else "close"}\r\n\r\n').encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    #The pool is made before the server starts listening
+    async def start(self, host='127.0.0.1', port=8750):
+        self._get_pool()
+        return await asyncio.start_server(self.handle, host, port, limit=2**20, backlog=1024)
+
+_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+#Runs the service until interrupted
+async def serve(host='127.0.0.1', port=8750, ready=None, **settings):
+    service = EquilibriumService(**settings)
+    server = await service.start(host, port)
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
@@ -0,0 +1,180 @@
+import time
+import warnings
+
+import numpy as np
+
+from . import telemetry
+from .thermo import get_database
+
+#All functions take T in degrees C and is_ideal as 'true'/'false'
+#db is the ThermoDatabase to use for activities, the default Mg-Nd database when left out
+
+#REDUCTION CALCULATIONS
+#Non-standard delta G value for reduction of Nd2O3 by Mg
+def calc_delta_G(X_Nd, is_ideal, Gf_MgO, Gf_Nd2O3, Gf_NdL, T, db=None):
+    if db is None:
+        db = get_database()
+    
+    if is_ideal == 'true':
+        a_Nd = X_Nd
+        a_Mg = 1 - X_Nd
+    else:
+        a_Nd = db.activity(T, X_Nd, 'Nd')
+        a_Mg = db.activity(T, X_Nd, 'Mg')
+        
+    delta_G = (3 * Gf_MgO + 2 * Gf_NdL - Gf_Nd2O3) + 8.314 * (T + 273.15) * np.log(a_Nd**2 / a_Mg**3)
+    
+    return(delta_G)
+
+#Vectorized root finder for func(X_Nd) = 0, solving a whole array of X_Nd at once
+#func has to increase with X_Nd and change sign between X_Nd_low and X_Nd_high (both arrays of the same shape)
+#Elements where it doesn't (func(X_Nd_low) <= 0 <= func(X_Nd_high) fails) have no root and come back NaN and not converged
+#Uses Newton steps from a finite difference slope, falling back to bisection whenever Newton leaves the bracket
+#If stats is a dict it gets the iterations each element took, the number of func evaluations and the final residuals
+def find_root(func, X_Nd_low, X_Nd_high, iterations, precision, stats=None):
+    X_Nd_low = np.array(X_Nd_low, dtype=float)
+    X_Nd_high = np.array(X_Nd_high, dtype=float)
+    X_Nd_guess = 0.5 * (X_Nd_low + X_Nd_high)
+    converged = np.zeros(X_Nd_guess.shape, dtype=bool)
+    iterations_used = np.full(X_Nd_guess.shape, iterations)
+    
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        bracketed = (func(X_Nd_low) <= 0) & (func(X_Nd_high) >= 0)
+    evaluations = 2 * X_Nd_guess.size
+    #Elements without a root are left out of the iterations
+    converged = ~bracketed
+    
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for i in range(iterations):
+            
+            f_guess = func(X_Nd_guess)
+            evaluations += X_Nd_guess.size
+            
+            #An element is done once it is inside the precision window or the bracket can't shrink any more
+            converged = converged | (np.abs(f_guess) <= precision) | (X_Nd_high - X_Nd_low <= 4 * np.spacing(X_Nd_guess))
+            if stats is not None:
+                iterations_used = np.where(converged & (iterations_used == iterations), i, iterations_used)
+            if converged.all():
+                break
+            
+            #Shrink the bracket around the root
+            below = f_guess < 0
+            X_Nd_low = np.where(below & ~converged, X_Nd_guess, X_Nd_low)
+            X_Nd_high = np.where(~below & ~converged, X_Nd_guess, X_Nd_high)
+            
+            #Newton step, only kept if it lands inside the bracket
+            step = 1E-7 * np.minimum(X_Nd_guess, 1 - X_Nd_guess)
+            slope = (func(X_Nd_guess + step) - f_guess) / step
+            evaluations += X_Nd_guess.size
+            X_Nd_newton = X_Nd_guess - f_guess / slope
+            inside = np.isfinite(X_Nd_newton) & (X_Nd_newton > X_Nd_low) & (X_Nd_newton < X_Nd_high)
+            X_Nd_next = np.where(inside, X_Nd_newton, 0.5 * (X_Nd_low + X_Nd_high))
+            
+            X_Nd_guess = np.where(converged, X_Nd_guess, X_Nd_next)
+    
+    if not converged.all():
+        warnings.warn('Not enough iterations to converge', RuntimeWarning)
+    
+    #Elements without a root get the residual at the middle of their range
+    if stats is not None:
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            stats['residual'] = func(X_Nd_guess)
+        stats['iterations'] = iterations_used
+        stats['evaluations'] = evaluations
+    
+    return np.where(bracketed, X_Nd_guess, np.nan), converged & bracketed
+
+#Function to calculate the equilibrium reduction composition
+#Gf values and T can be single numbers or arrays, every temperature is solved at the same time
+#Returns the equilibrium X Nd and whether each element converged
+def calc_eq_comp(is_ideal, Gf_MgO, Gf_Nd2O3, Gf_NdL, T, iterations, precision, db=None):
+    shape = np.broadcast(Gf_MgO, Gf_Nd2O3, Gf_NdL, T).shape
+    X_Nd_low = np.full(shape, 1E-12)
+    X_Nd_high = np.full(shape, 1 - 1E-12)
+    
+    def delta_G_func(X_Nd):
+        return calc_delta_G(X_Nd, is_ideal, Gf_MgO, Gf_Nd2O3, Gf_NdL, T, db)
+    
+    if not telemetry.enabled():
+        return find_root(delta_G_func, X_Nd_low, X_Nd_high, iterations, precision)
+    
+    stats = {}
+    start = time.perf_counter()
+    eq_comp, converged = find_root(delta_G_func, X_Nd_low, X_Nd_high, iterations, precision, stats)
+    telemetry.record('reduction', time.perf_counter() - start, stats['iterations'], stats['evaluations'],
+                     stats['residual'], converged, np.broadcast_to(T, shape))
+    
+    return eq_comp, converged
+
+#HYDRIDE PRECIPITATION CALCULATIONS
+#Non-standard delta G value for hydride precipitation
+def calc_hyd_delta_G(X_Nd, is_ideal, Gf_NdH2, Gf_NdL, T, db=None):
+    if db is None:
+        db = get_database()
+    
+    if is_ideal == 'true':
+        a_Nd = X_Nd
+    else:
+        a_Nd = db.activity(T, X_Nd, 'Nd')
+        
+    delta_G = Gf_NdH2 - Gf_NdL + (8.314 * (T + 273.15) * np.log(1 / (a_Nd)))
+    
+    return(delta_G)
+
+#Function for determining equilibrium hydriding X Nd over a whole grid of temperatures and H2 pressures
+#T, Gf_NdH2 and Gf_NdL are arrays over temperature (or one may be a single value), P_H2 is an array of pressures,
+#result is a (T, P_H2) matrix
+#The a Nd in equilibrium with NdH2 is closed form, so the ideal case is just a broadcast
+#For the non-ideal case gamma Nd from the thermodynamic database is linear between the activity data points,
+#so a Nd = X Nd * (gamma_k + slope_k * (X Nd - X_k)) is a quadratic in each interval and can be inverted exactly
+def calc_hyd_eq_comp(is_ideal, Gf_NdH2, Gf_NdL, T, P_H2, db=None):
+    start = time.perf_counter()
+    T = np.asarray(T, dtype=float).reshape(-1, 1)
+    Gf_NdH2 = np.asarray(Gf_NdH2, dtype=float).reshape(-1, 1)
+    Gf_NdL = np.asarray(Gf_NdL, dtype=float).reshape(-1, 1)
+    P_H2 = np.asarray(P_H2, dtype=float).reshape(1, -1)
+    a_Nd = (np.exp((Gf_NdH2 - Gf_NdL) / (8.314 * (T + 273.15)))) / P_H2
+    
+    if is_ideal == 'true':
+        if telemetry.enabled():
+            _record_hydride(start, a_Nd, a_Nd, np.zeros(a_Nd.shape), 0, T, P_H2)
+        return a_Nd
+    
+    #Inverse table, a Nd at each activity data point is increasing with X Nd
+    if db is None:
+        db = get_database()
+    X_k = db.X_Nd_data
+    #One table per distinct temperature, so rows at the same temperature (e.g. Monte Carlo samples) share a lookup
+    T_rows = np.broadcast_to(T, (a_Nd.shape[0], 1))[:, 0]
+    T_unique, row_table = np.unique(T_rows, return_inverse=True)
+    gamma_k, slope_k = db.gamma_table(T_unique, 'Nd')
+    a_k = X_k * gamma_k
+    
+    hyd_eq_comp = np.empty(a_Nd.shape)
+    for u in range(len(T_unique)):
+        rows = row_table == u
+        #Interval holding the target a Nd, the end intervals are extrapolated like interp1d does
+        k = np.clip(np.searchsorted(a_k[u], a_Nd[rows]) - 1, 0, len(X_k) - 2)
+        m = slope_k[u][k]
+        b = gamma_k[u][k] - m * X_k[k]
+        #Increasing root of m X^2 + b X - a = 0, written so it still works when m = 0
+        root = np.sqrt(np.maximum(b**2 + 4 * m * a_Nd[rows], 0))
+        hyd_eq_comp[rows] = 2 * a_Nd[rows] / (b + root)
+    
+    #Above a Nd = 1 there is no liquid composition in equilibrium with the hydride
+    hyd_eq_comp = np.where(a_Nd > 1, a_Nd, hyd_eq_comp)
+    
+    if telemetry.enabled():
+        #Closed form, so the residual is only rounding; the evaluations are the inverse table entries
+        T_grid = np.broadcast_to(T, a_Nd.shape)
+        with np.errstate(invalid='ignore'):
+            residual = np.where(a_Nd > 1, 0, db.activity(T_grid, hyd_eq_comp, 'Nd') - a_Nd)
+        _record_hydride(start, a_Nd, hyd_eq_comp, residual, T_unique.size * X_k.size, T, P_H2)
+    
+    return(hyd_eq_comp)
+
+#Telemetry for one calc_hyd_eq_comp call, no iterations since the inverse is closed form
+def _record_hydride(start, a_Nd, hyd_eq_comp, residual, evaluations, T, P_H2):
+    converged = np.isfinite(hyd_eq_comp)
+    telemetry.record('hydride', time.perf_counter() - start, np.zeros(a_Nd.shape, dtype=int), evaluations,
+                     residual, converged, np.broadcast_to(T, a_Nd.shape), np.broadcast_to(P_H2, a_Nd.shape))
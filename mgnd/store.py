@@ -0,0 +1,189 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from .thermo import ThermoDatabase
+
+#THERMODYNAMIC DATA STORE
+#A database on disk is a folder of .npy arrays plus meta.json, so any part of it can be memory-mapped
+#    temps.npy            (n_T) degrees C
+#    X_solute.npy         (n_X) solute mole fractions of the activity data
+#    X_solvent.npy        (n_X) solvent mole fractions (1e-12 instead of 0 at the pure solute end, like the Mg-Nd data)
+#    a_<species>.npy      (n_T, n_X) activities of the solute and the solvent
+#    Gf_<name>.npy        (n_T) standard free energies of formation, J/mol
+#    liquidus_T.npy / liquidus_X.npy, optional intermetallic liquidus points
+#    meta.json            species, the Gf names, where the data came from and the format version
+#Readers for ThermoCalc activity tables and HSC free energy tables turn exports straight into a store
+#    python -m mgnd store -o MgNd_store
+#    python -m mgnd store -o MgDy_store --species Dy Mg --thermocalc activities.txt --hsc gibbs.txt --liquidus liquidus.txt
+#A store written without liquidus points can't be used for anything that needs the intermetallic liquidus
+
+format_version = 1
+meta_name = 'meta.json'
+
+def write_store(path, temps, X_solute, X_solvent, Gf_data, activities, species=('Nd', 'Mg'), liquidus=None, source=''):
+    temps = np.asarray(temps, dtype=float)
+    order = np.argsort(temps)
+    os.makedirs(path, exist_ok=True)
+    arrays = {'temps': temps[order], 'X_solute': X_solute, 'X_solvent': X_solvent}
+    arrays.update({name: np.asarray(values, dtype=float)[order] for name, values in Gf_data.items()})
+    arrays.update({f'a_{name}': np.asarray(values, dtype=float)[order] for name, values in activities.items()})
+    if liquidus is not None:
+        arrays['liquidus_T'], arrays['liquidus_X'] = liquidus
+    for name, values in arrays.items():
+        np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(values, dtype=float))
+    meta = {
+        'format_version': format_version,
+        'species': list(species),
+        'Gf_names': list(Gf_data),
+        'n_T': len(temps),
+        'n_X': len(arrays['X_solute']),
+        'liquidus': liquidus is not None,
+        'source': source,
+    }
+    with open(os.path.join(path, meta_name), 'w') as f:
+        json.dump(meta, f, indent=1)
+    return path
+
+#The built-in Mg-Nd data as a store
+def write_builtin_store(path):
+    from . import data
+    temps = list(data.thermochemical_data)
+    Gf_names = [name for name in data.thermochemical_data[temps[0]] if name.startswith('Gf_')]
+    return write_store(
+        path, temps, data.X_Nd_a_data, data.X_Mg_a_data,
+        {name: [data.thermochemical_data[T][name] for T in temps] for name in Gf_names},
+        {species: [data.thermochemical_data[T][f'a_{species}'] for T in temps] for species in ('Nd', 'Mg')},
+        ('Nd', 'Mg'), (data.T_Mg3Nd_liquidus_data, data.X_Nd_Mg3Nd_liquidus_data), 'mgnd.data')
+
+#meta.json and every array of a store, memory-mapped unless mmap is False
+def load_arrays(path, mmap=True):
+    with open(os.path.join(path, meta_name)) as f:
+        meta = json.load(f)
+    if meta.get('format_version', 0) > format_version:
+        raise ValueError(f'{path} was written by a newer version of mgnd (format {meta["format_version"]})')
+    names = ['temps', 'X_solute', 'X_solvent'] + meta['Gf_names'] + [f'a_{species}' for species in meta['species']]
+    if meta['liquidus']:
+        names += ['liquidus_T', 'liquidus_X']
+    arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None) for name in names}
+    return meta, arrays
+
+#ThermoDatabase built from a store, with no per value Python objects on the way
+#The stored liquidus points, when there are any, go with it and are what calc_X_Nd_Mg3Nd uses for this database
+def load_store(path, mmap=True):
+    meta, arrays = load_arrays(path, mmap)
+    return ThermoDatabase.from_arrays(
+        arrays['temps'], arrays['X_solute'], arrays['X_solvent'],
+        {name: arrays[name] for name in meta['Gf_names']},
+        {species: arrays[f'a_{species}'] for species in meta['species']},
+        meta['species'],
+        (arrays['liquidus_T'], arrays['liquidus_X']) if meta['liquidus'] else None)
+
+#IMPORTERS
+#Rows of a delimited text export (tab, comma or semicolon, found from the header) as {column name: float array}
+#Lines before the header that don't have the delimiter (titles, blank lines) are skipped
+def read_table(path):
+    with open(path, newline='') as f:
+        lines = [line for line in f if line.strip()]
+    delimiter = max('\t,;', key=lambda d: max(line.count(d) for line in lines[:5]))
+    start = next(i for i, line in enumerate(lines) if line.count(delimiter) > 0)
+    rows = list(csv.reader(lines[start:], delimiter=delimiter))
+    header = [name.strip() for name in rows[0]]
+    values = np.array([[float(value) if value.strip() else np.nan for value in row] for row in rows[1:] if row], dtype=float)
+    return {name: values[:, i] for i, name in enumerate(header)}
+
+#Column of table whose name matches one of names, ignoring case and spaces
+def _column(table, names, path):
+    lookup = {name.replace(' ', '').upper(): name for name in table}
+    for name in names:
+        if name.replace(' ', '').upper() in lookup:
+            return table[lookup[name.replace(' ', '').upper()]]
+    raise KeyError(f'{path} has none of the columns {", ".join(names)} (columns: {", ".join(table)})')
+
+#ThermoCalc activity table in long format, one row per (T, X) point, e.g. exported from a property grid calculation as
+#    T    X(LIQUID,DY)    ACR(DY)    ACR(MG)
+#Returns (temps in C, solute X, {species: (n_T, n_X) activities}); every temperature needs the same X grid,
+#with each (T, X) point given exactly once
+#At a pure end (X = 0 or 1) the missing species has zero activity and no activity coefficient, so a composition
+#exported with a zero activity there is dropped (gamma is extrapolated from its neighbours instead);
+#otherwise X = 0 becomes 1e-12 like the Mg-Nd data, so gamma = a / X stays finite
+def import_thermocalc(path, species=('Nd', 'Mg'), T_unit='K'):
+    solute, solvent = (name.upper() for name in species)
+    table = read_table(path)
+    T = _column(table, ['T', 'T(K)', 'T(C)', 'TEMPERATURE'], path)
+    X = _column(table, [f'X(LIQUID,{solute})', f'X({solute})', f'X_{solute}'], path)
+    a_solute = _column(table, [f'ACR({solute})', f'AC({solute})', f'a_{solute}'], path)
+    a_solvent = _column(table, [f'ACR({solvent})', f'AC({solvent})', f'a_{solvent}'], path)
+    if T_unit == 'K':
+        T = T - 273.15
+
+    temps = np.unique(np.round(T, 6))
+    X_grid = np.unique(X)
+    i = np.searchsorted(temps, np.round(T, 6))
+    j = np.searchsorted(X_grid, X)
+    filled = np.bincount(i * len(X_grid) + j, minlength=len(temps) * len(X_grid))
+    if (filled != 1).any():
+        raise ValueError(f'{path} is not a full T x X grid with one row per point ({len(temps)} temperatures, '
+                         f'{len(X_grid)} compositions, {np.sum(filled == 0)} points missing, {np.sum(filled > 1)} repeated)')
+    activities = {species[0]: np.full((len(temps), len(X_grid)), np.nan), species[1]: np.full((len(temps), len(X_grid)), np.nan)}
+    activities[species[0]][i, j] = a_solute
+    activities[species[1]][i, j] = a_solvent
+    if any(np.isnan(values).any() for values in activities.values()):
+        raise ValueError(f'{path} has blank activities')
+
+    keep = ~(((X_grid == 0) & (activities[species[0]] <= 0).any(axis=0)) | ((X_grid == 1) & (activities[species[1]] <= 0).any(axis=0)))
+    X_grid = np.maximum(X_grid[keep], 1E-12)
+    activities = {name: values[:, keep] for name, values in activities.items()}
+    if any((values <= 0).any() for values in activities.values()):
+        raise ValueError(f'{path} has activities of 0 or less away from the pure ends')
+    return temps, X_grid, activities
+
+#HSC free energy table, a T column and one column per compound, e.g.
+#    T    Nd2O3    MgO    NdH2    Nd(l)
+#columns maps column names to Gf names (e.g. {'Nd(l)': 'Gf_NdL'}), the others become 'Gf_' + column name
+#Values are interpolated linearly onto temps when given; HSC exports kJ/mol by default, energy_unit='J' for J/mol
+def import_hsc(path, temps=None, columns=None, T_unit='C', energy_unit='kJ'):
+    table = read_table(path)
+    T_name = next(name for name in table if name.replace(' ', '').upper() in ('T', 'T(C)', 'T(K)', 'TEMPERATURE'))
+    T = table.pop(T_name)
+    if T_unit == 'K':
+        T = T - 273.15
+    order = np.argsort(T)
+    T = T[order]
+    scale = 1000 if energy_unit == 'kJ' else 1
+    columns = columns or {}
+    Gf_data = {}
+    for name, values in table.items():
+        values = values[order] * scale
+        if temps is not None:
+            if np.min(temps) < T[0] or np.max(temps) > T[-1]:
+                raise ValueError(f'{path} covers {T[0]:g}-{T[-1]:g} C, not every temperature asked for')
+            values = np.interp(temps, T, values)
+        Gf_data[columns.get(name, 'Gf_' + name)] = values
+    return (T if temps is None else np.asarray(temps, dtype=float)), Gf_data
+
+#Intermetallic liquidus points, a T column and the solute mole fraction where the intermetallic forms, e.g.
+#    T    X(DY)
+#Returns (T in C, X) sorted by T, the liquidus argument of write_store; the spline through them needs 3 points or more
+def import_liquidus(path, species=('Nd', 'Mg'), T_unit='C'):
+    solute = species[0].upper()
+    table = read_table(path)
+    T = _column(table, ['T', 'T(C)', 'T(K)', 'TEMPERATURE'], path)
+    X = _column(table, [f'X(LIQUID,{solute})', f'X({solute})', f'X_{solute}', 'X'], path)
+    if T_unit == 'K':
+        T = T - 273.15
+    keep = np.isfinite(T) & np.isfinite(X)
+    T, X = T[keep], X[keep]
+    if len(np.unique(T)) != len(T) or len(T) < 3:
+        raise ValueError(f'{path} needs 3 or more liquidus points at different temperatures, not {len(T)}')
+    order = np.argsort(T)
+    return T[order], X[order]
+
+#Store from a ThermoCalc activity table and an HSC free energy table, Gf values interpolated to the activity temperatures
+def import_store(path, thermocalc_path, hsc_path, species=('Nd', 'Mg'), hsc_columns=None, thermocalc_T_unit='K', hsc_T_unit='C', energy_unit='kJ', liquidus=None):
+    temps, X, activities = import_thermocalc(thermocalc_path, species, thermocalc_T_unit)
+    _, Gf_data = import_hsc(hsc_path, temps, hsc_columns, hsc_T_unit, energy_unit)
+    return write_store(path, temps, X, np.maximum(1 - X, 1E-12), Gf_data, activities, species, liquidus,
+                       f'{os.path.basename(thermocalc_path)} + {os.path.basename(hsc_path)}')
@@ -0,0 +1,210 @@
+import json
+import os
+
+import numpy as np
+
+from .thermo import get_database
+
+#DELTA G LOOKUP TABLES
+#Dense (T, X Nd) tables of the reduction and hydride delta G, built once and read back memory-mapped
+#Each delta G is split as
+#    delta G = delta G standard(T) + RT * (ideal mixing term) + RT * (excess term from the activity coefficients)
+#    reduction: ideal term 2 ln X_Nd - 3 ln(1 - X_Nd), excess term 2 ln gamma_Nd - 3 ln gamma_Mg
+#    hydride: ideal term -ln X_Nd, excess term -ln gamma_Nd
+#Only the smooth parts (standard delta G and excess terms) are tabulated, the ideal term is added exactly on lookup,
+#so lookups stay accurate next to X Nd = 0 and 1 where delta G runs off to infinity
+#The X Nd grid includes the activity data points, where gamma has its kinks, and the T grid the tabulated temperatures
+#On the default grids, bilinear lookups are within 1 J/mol of calc_delta_G and calc_hyd_delta_G, and the reduction and
+#hydride equilibrium queries within 1e-6 X Nd of the direct solvers (largest seen 8e-7, 640-860 C, P_H2 1e-9 to 1.1 atm)
+#Bicubic lookups are smoother but overshoot next to the kinks, by up to ~26 J/mol and 2e-5 X Nd, so bilinear is the default
+#Grids coarser than the defaults give larger errors
+#    tables = build_tables('delta_G_tables')  #once
+#    tables = open_tables('delta_G_tables')  #in the dashboard
+#    tables.delta_G(T, X_Nd), tables.eq_comp(T), tables.hyd_eq_comp(T, P_H2)
+
+table_names = ('T', 'X_Nd', 'delta_G_standard', 'hyd_delta_G_standard', 'excess', 'hyd_excess')
+meta_name = 'meta.json'
+
+#Default grids: every degree from 640 to 860 C, and X Nd every 0.0005 plus the activity data points,
+#with the first and last data intervals filled in much more finely since ln gamma bends sharply where gamma gets small
+def default_temps():
+    return np.arange(640, 861, 1, dtype=float)
+
+def default_X_Nd(db):
+    X_k = db.X_Nd_data
+    return np.unique(np.concatenate([
+        np.linspace(0, 1, 2001), X_k,
+        np.linspace(X_k[0], X_k[1], 1001), np.linspace(X_k[-2], X_k[-1], 1001),
+    ]))
+
+#Table arrays for the given grids, all T at once
+def calc_tables(temps=None, X_Nd=None, db=None):
+    if db is None:
+        db = get_database()
+    temps = default_temps() if temps is None else np.asarray(temps, dtype=float)
+    X_Nd = default_X_Nd(db) if X_Nd is None else np.asarray(X_Nd, dtype=float)
+    T = temps[:, np.newaxis]
+    ln_gamma_Nd = np.log(db.gamma(T, X_Nd, 'Nd'))
+    ln_gamma_Mg = np.log(db.gamma(T, X_Nd, 'Mg'))
+    return {
+        'T': temps,
+        'X_Nd': X_Nd,
+        'delta_G_standard': 3 * db.Gf(temps, 'Gf_MgO') + 2 * db.Gf(temps, 'Gf_NdL') - db.Gf(temps, 'Gf_Nd2O3'),
+        'hyd_delta_G_standard': db.Gf(temps, 'Gf_NdH2') - db.Gf(temps, 'Gf_NdL'),
+        'excess': 2 * ln_gamma_Nd - 3 * ln_gamma_Mg,
+        'hyd_excess': -ln_gamma_Nd,
+    }
+
+#Writes the tables to a folder as .npy files (one per array) plus meta.json with the grid sizes and data fingerprint
+def build_tables(path, temps=None, X_Nd=None, db=None):
+    if db is None:
+        db = get_database()
+    tables = calc_tables(temps, X_Nd, db)
+    os.makedirs(path, exist_ok=True)
+    for name, values in tables.items():
+        out = np.lib.format.open_memmap(os.path.join(path, name + '.npy'), mode='w+', dtype=float, shape=values.shape)
+        out[...] = values
+        out.flush()
+        del out
+    with open(os.path.join(path, meta_name), 'w') as f:
+        json.dump({'fingerprint': db.fingerprint(), 'n_T': len(tables['T']), 'n_X': len(tables['X_Nd'])}, f, indent=1)
+    return DeltaGTables(tables, db.fingerprint())
+
+#Opens tables written by build_tables without reading them into memory
+def open_tables(path):
+    with open(os.path.join(path, meta_name)) as f:
+        meta = json.load(f)
+    #Plain ndarray views of the maps, which index much faster than np.memmap itself
+    tables = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r').view(np.ndarray) for name in table_names}
+    return DeltaGTables(tables, meta['fingerprint'])
+
+#Index of the grid interval holding each x (end intervals extrapolated) and the position within it
+def _locate(grid, x):
+    i = np.clip(np.searchsorted(grid, x) - 1, 0, len(grid) - 2)
+    return i, (x - grid[i]) / (grid[i + 1] - grid[i])
+
+#Catmull-Rom weights for the 4 points around an interval, t the position within it
+def _cubic_weights(t):
+    t2 = t * t
+    t3 = t2 * t
+    return (-0.5 * t3 + t2 - 0.5 * t, 1.5 * t3 - 2.5 * t2 + 1, -1.5 * t3 + 2 * t2 + 0.5 * t, 0.5 * t3 - 0.5 * t2)
+
+class DeltaGTables:
+    def __init__(self, tables, fingerprint):
+        self.T = np.asarray(tables['T'])
+        self.X_Nd = np.asarray(tables['X_Nd'])
+        self.tables = tables
+        self.fingerprint = fingerprint
+        #Ideal mixing terms on the grid (without its end points), used to bracket equilibrium queries
+        X = self.X_Nd[1:-1]
+        self._ideal_rows = {'delta_G_standard': 2 * np.log(X) - 3 * np.log(1 - X), 'hyd_delta_G_standard': -np.log(X)}
+
+    #True if the tables were built from the same data as db
+    def is_current(self, db=None):
+        if db is None:
+            db = get_database()
+        return self.fingerprint == db.fingerprint()
+
+    #Standard delta G at T, linear between grid temperatures
+    def _standard(self, name, T):
+        i, w = _locate(self.T, T)
+        values = self.tables[name]
+        return (1 - w) * values[i] + w * values[i + 1]
+
+    #Excess term at (T, X Nd) points, bilinear or Catmull-Rom bicubic (clamped at the grid edges)
+    def _excess(self, name, T, X_Nd, method):
+        values = self.tables[name]
+        i, u = _locate(self.T, T)
+        j, v = _locate(self.X_Nd, X_Nd)
+        if method == 'linear':
+            return ((1 - u) * ((1 - v) * values[i, j] + v * values[i, j + 1])
+                    + u * ((1 - v) * values[i + 1, j] + v * values[i + 1, j + 1]))
+        if method != 'cubic':
+            raise ValueError(f"method must be 'linear' or 'cubic', not {method!r}")
+        n_T, n_X = values.shape
+        result = 0
+        for a, weight_T in zip(range(-1, 3), _cubic_weights(u)):
+            row = np.clip(i + a, 0, n_T - 1)
+            inner = 0
+            for b, weight_X in zip(range(-1, 3), _cubic_weights(v)):
+                inner = inner + weight_X * values[row, np.clip(j + b, 0, n_X - 1)]
+            result = result + weight_T * inner
+        return result
+
+    #Reduction delta G (J/mol of Nd2O3) at any (T, X Nd) points, broadcast together
+    def delta_G(self, T, X_Nd, is_ideal='false', method='linear'):
+        T, X_Nd = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(X_Nd, dtype=float))
+        RT = 8.314 * (T + 273.15)
+        delta_G = self._standard('delta_G_standard', T) + RT * (2 * np.log(X_Nd) - 3 * np.log(1 - X_Nd))
+        if is_ideal != 'true':
+            delta_G = delta_G + RT * self._excess('excess', T, X_Nd, method)
+        return delta_G
+
+    #Hydride precipitation delta G (at P_H2 = 1) at any (T, X Nd) points
+    def hyd_delta_G(self, T, X_Nd, is_ideal='false', method='linear'):
+        T, X_Nd = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(X_Nd, dtype=float))
+        RT = 8.314 * (T + 273.15)
+        delta_G = self._standard('hyd_delta_G_standard', T) - RT * np.log(X_Nd)
+        if is_ideal != 'true':
+            delta_G = delta_G + RT * self._excess('hyd_excess', T, X_Nd, method)
+        return delta_G
+
+    #Delta G over the whole X Nd grid (without its end points) at each T, linear in T, one row per T
+    def _rows(self, standard, excess, T, is_ideal):
+        i, w = _locate(self.T, T)
+        RT = (8.314 * (T + 273.15))[:, np.newaxis]
+        rows = self._standard(standard, T)[:, np.newaxis] + RT * self._ideal_rows[standard]
+        if is_ideal != 'true':
+            values = self.tables[excess]
+            rows = rows + RT * ((1 - w)[:, np.newaxis] * values[i, 1:-1] + w[:, np.newaxis] * values[i + 1, 1:-1])
+        return rows
+
+    #X Nd where func(T, X Nd) crosses target, func increasing with X Nd (or decreasing when sign is -1)
+    #The crossing is bracketed on the grid rows, then refined with secant steps on func between the bracketing points
+    def _crossing(self, func, rows, T, target, sign, steps=2):
+        X = self.X_Nd[1:-1]
+        n = len(T)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            row = sign * (rows - target[:, np.newaxis])
+            #First grid point at or above the crossing, the ends of the grid mean no crossing inside it
+            k = np.argmax(row >= 0, axis=1)
+            found = (row[np.arange(n), k] >= 0) & (k > 0)
+            k = np.clip(k, 1, len(X) - 1)
+            X_low = X[k - 1]
+            X_high = X[k]
+            #Bracket ends again with func itself, which is not linear in T between grid rows (and may be bicubic)
+            f_ends = sign * (func(np.tile(T, 2), np.concatenate([X_low, X_high])) - np.tile(target, 2))
+            f_low = f_ends[:n]
+            f_high = f_ends[n:]
+            X_new = 0.5 * (X_low + X_high)
+            for step in range(steps):
+                X_new = X_low - f_low * (X_high - X_low) / (f_high - f_low)
+                X_new = np.where(np.isfinite(X_new), np.clip(X_new, X_low, X_high), 0.5 * (X_low + X_high))
+                f_new = sign * (func(T, X_new) - target)
+                below = f_new < 0
+                X_low = np.where(below, X_new, X_low)
+                f_low = np.where(below, f_new, f_low)
+                X_high = np.where(below, X_high, X_new)
+                f_high = np.where(below, f_high, f_new)
+        return np.where(found, X_new, np.nan)
+
+    #Equilibrium reduction X Nd (delta G = 0) at temperature(s) T, NaN if there is no crossing on the grid
+    def eq_comp(self, T, is_ideal='false', method='linear'):
+        T = np.asarray(T, dtype=float)
+        shape = T.shape
+        T = T.ravel()
+        rows = self._rows('delta_G_standard', 'excess', T, is_ideal)
+        X_Nd = self._crossing(lambda T, X: self.delta_G(T, X, is_ideal, method), rows, T, np.zeros(len(T)), 1)
+        return X_Nd.reshape(shape)
+
+    #Equilibrium hydriding X Nd at (T, P_H2), where the hydride delta G equals RT ln(P_H2)
+    #NaN where NdH2 is stable at every X Nd on the grid or at none
+    def hyd_eq_comp(self, T, P_H2, is_ideal='false', method='linear'):
+        T, P_H2 = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P_H2, dtype=float))
+        shape = T.shape
+        T = T.ravel()
+        with np.errstate(divide='ignore'):
+            target = 8.314 * (T + 273.15) * np.log(P_H2.ravel())
+        rows = self._rows('hyd_delta_G_standard', 'hyd_excess', T, is_ideal)
+        X_Nd = self._crossing(lambda T, X: self.hyd_delta_G(T, X, is_ideal, method), rows, T, target, -1)
+        return X_Nd.reshape(shape)
@@ -0,0 +1,157 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+#SOLVER TELEMETRY
+#Per solve statistics from the equilibrium solvers, grouped by stage ('reduction', 'hydride'):
+#iterations to converge, interpolant (delta G / activity) evaluations, wall time and the final residual
+#Off unless collect() is active, so normal runs only pay for one check per solver call
+#Only solves in this process are recorded, not ones running in worker processes
+#    with telemetry.collect() as stats:
+#        analyses.calc_reduction(temps)
+#    stats.dump('telemetry.json')
+
+#Residuals are histogrammed in decades from 1e-16 to 1e6 (delta G in J/mol, hydride in a Nd), NaN goes in the top bin
+residual_decades = np.arange(-16, 7)
+
+_active = None
+
+def enabled():
+    return _active is not None
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.solves = 0
+        self.seconds = 0.0
+        self.evaluations = 0
+        self.not_converged = 0
+        self.iteration_counts = np.zeros(0, dtype=np.int64)
+        self.residual_counts = np.zeros(len(residual_decades) + 1, dtype=np.int64)
+        #Iterations and solves per temperature, to see which temperatures the time goes into
+        self.by_T = {}
+        #Conditions of solves that did not converge, the first max_failures of them
+        self.failures = []
+
+    def add(self, seconds, iterations, evaluations, residual, converged, T, P_H2=None, max_failures=100):
+        residual = np.abs(np.asarray(residual, dtype=float))
+        shape = residual.shape
+        residual = residual.ravel()
+        iterations = np.broadcast_to(np.asarray(iterations, dtype=np.int64), shape).ravel()
+        converged = np.broadcast_to(converged, shape).ravel()
+        T = np.broadcast_to(T, shape).ravel()
+        if P_H2 is not None:
+            P_H2 = np.broadcast_to(P_H2, shape).ravel()
+
+        self.calls += 1
+        self.solves += len(residual)
+        self.seconds += seconds
+        self.evaluations += int(evaluations)
+        self.not_converged += int(np.count_nonzero(~converged))
+
+        counts = np.bincount(iterations)
+        if len(counts) > len(self.iteration_counts):
+            self.iteration_counts = np.pad(self.iteration_counts, (0, len(counts) - len(self.iteration_counts)))
+        self.iteration_counts[:len(counts)] += counts
+
+        with np.errstate(divide='ignore'):
+            decade = np.searchsorted(residual_decades, np.floor(np.log10(residual)), side='right')
+        self.residual_counts += np.bincount(decade, minlength=len(self.residual_counts))
+
+        T_unique, inverse = np.unique(T, return_inverse=True)
+        iterations_per_T = np.bincount(inverse, weights=iterations)
+        solves_per_T = np.bincount(inverse)
+        for T_value, n_iterations, n_solves in zip(T_unique.tolist(), iterations_per_T, solves_per_T):
+            entry = self.by_T.setdefault(T_value, [0, 0])
+            entry[0] += int(n_iterations)
+            entry[1] += int(n_solves)
+
+        for i in np.flatnonzero(~converged)[:max_failures - len(self.failures)]:
+            failure = {'T': float(T[i]), 'residual': float(residual[i]), 'iterations': int(iterations[i])}
+            if P_H2 is not None:
+                failure['P_H2'] = float(P_H2[i])
+            self.failures.append(failure)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'solves': self.solves,
+            'seconds': self.seconds,
+            'solves_per_second': self.solves / self.seconds if self.seconds else None,
+            'evaluations': self.evaluations,
+            'not_converged': self.not_converged,
+            'iterations_histogram': {str(n): int(count) for n, count in enumerate(self.iteration_counts) if count},
+            'mean_iterations': float(np.dot(np.arange(len(self.iteration_counts)), self.iteration_counts) / max(self.solves, 1)),
+            #Keys are the upper edge of each decade, '<1e-16' holds exact zeros as well
+            'residual_histogram': {label: int(count) for label, count in zip(_decade_labels(), self.residual_counts) if count},
+            'iterations_by_T': {f'{T:g}': {'iterations': n, 'solves': s} for T, (n, s) in sorted(self.by_T.items())},
+            'failures': self.failures,
+        }
+
+def _decade_labels():
+    return [f'<1e{residual_decades[0]}'] + [f'<1e{d + 1}' for d in residual_decades[:-1]] + [f'>=1e{residual_decades[-1]}']
+
+class Telemetry:
+    def __init__(self):
+        self.stages = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, iterations, evaluations, residual, converged, T, P_H2=None):
+        with self._lock:
+            self.stages.setdefault(stage, StageStats()).add(seconds, iterations, evaluations, residual, converged, T, P_H2)
+
+    def to_dict(self):
+        with self._lock:
+            return {'elapsed': time.time() - self.started, 'stages': {name: stats.to_dict() for name, stats in self.stages.items()}}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    #One line per stage, for printing at the end of a run or from watch()
+    def summary(self):
+        lines = []
+        for name, stats in self.to_dict()['stages'].items():
+            lines.append(f"{name}: {stats['solves']} solves in {stats['calls']} calls, {stats['seconds']:.3f} s, "
+                         f"{stats['mean_iterations']:.1f} iterations on average, {stats['evaluations']} evaluations, "
+                         f"{stats['not_converged']} not converged")
+        return '\n'.join(lines) if lines else 'no solves recorded'
+
+    #Prints the summary to out every interval seconds while the block runs
+    @contextmanager
+    def watch(self, interval=1.0, out=None):
+        out = sys.stderr if out is None else out
+        stop = threading.Event()
+
+        def report():
+            while not stop.wait(interval):
+                out.write(self.summary() + '\n')
+                out.flush()
+
+        thread = threading.Thread(target=report, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+#Records every solve in this process while the block runs
+@contextmanager
+def collect():
+    global _active
+    previous = _active
+    _active = Telemetry()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+def record(stage, seconds, iterations, evaluations, residual, converged, T, P_H2=None):
+    if _active is not None:
+        _active.record(stage, seconds, iterations, evaluations, residual, converged, T, P_H2)
@@ -0,0 +1,191 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .cache import make_key
+
+#THERMODYNAMIC DATABASE
+#Continuous temperature model built from the tabulated data, T in degrees C everywhere
+#Gf values are fitted as Gf = A + B*T + C*T*ln(T) with T in K, the usual form for HSC style data (fits within a few J/mol),
+#plus the fit residuals interpolated linearly between tabulated temperatures (held constant outside the table),
+#so Gf is continuous in T and still equal to the HSC values at the tabulated temperatures
+#Activity coefficients are stored as partial excess Gibbs energy RT*ln(gamma) on the (T, X Nd) grid
+#RT*ln(gamma) is linear in T between tabulated temperatures (constant excess enthalpy and entropy, extrapolated outside the table)
+#and gamma is linear in X Nd between data points (extrapolated at the ends like interp1d)
+#is_ideal follows the same 'true'/'false' convention as the calculation functions
+#Other binary systems work the same way: species is (solute, solvent), the activities are read from the 'a_<species>' keys
+#and X_Nd_data / X_Mg_data hold the solute and solvent mole fractions; every 'Gf_' key becomes a Gf table
+#liquidus is an optional (T, X) pair of intermetallic liquidus points (Mg3Nd for Mg-Nd), used by calc_X_Nd_Mg3Nd;
+#without them anything that needs the liquidus raises ValueError rather than borrowing the Mg-Nd curve
+class ThermoDatabase:
+    def __init__(self, thermochemical_data, X_Nd_data, X_Mg_data, species=('Nd', 'Mg'), liquidus=None):
+        temps = np.array([T for T in thermochemical_data], dtype=float)
+        solute, solvent = species
+        first = next(iter(thermochemical_data.values()))
+        Gf_data = {name: np.array([thermochemical_data[T][name] for T in thermochemical_data], dtype=float)
+                   for name in first if name.startswith('Gf_')}
+        activities = {
+            solute: np.array([thermochemical_data[T][f'a_{solute}'] for T in thermochemical_data], dtype=float),
+            solvent: np.array([thermochemical_data[T][f'a_{solvent}'] for T in thermochemical_data], dtype=float),
+        }
+        self._build(temps, X_Nd_data, X_Mg_data, Gf_data, activities, species, liquidus)
+    
+    #Database straight from arrays: temps (n_T), solute and solvent mole fractions (n_X), {Gf name: (n_T)}
+    #and {species: (n_T, n_X) activities}, as read from a data store without building the nested dicts
+    @classmethod
+    def from_arrays(cls, temps, X_Nd_data, X_Mg_data, Gf_data, activities, species=('Nd', 'Mg'), liquidus=None):
+        db = cls.__new__(cls)
+        db._build(np.asarray(temps, dtype=float), X_Nd_data, X_Mg_data,
+                  {name: np.asarray(values, dtype=float) for name, values in Gf_data.items()},
+                  {name: np.asarray(values, dtype=float) for name, values in activities.items()}, species, liquidus)
+        return db
+    
+    def _build(self, temps, X_Nd_data, X_Mg_data, Gf_data, activities, species, liquidus=None):
+        self.temps = temps
+        self.X_Nd_data = np.asarray(X_Nd_data, dtype=float)
+        self.X_Mg_data = np.asarray(X_Mg_data, dtype=float)
+        self.species = tuple(species)
+        self.Gf_names = tuple(Gf_data)
+        self.liquidus = None if liquidus is None else tuple(np.asarray(values, dtype=float) for values in liquidus)
+        self._liquidus_func = None
+        
+        #Least squares fit of each Gf over the tabulated temperatures
+        T_K = self.temps + 273.15
+        basis = np.column_stack([np.ones_like(T_K), T_K, T_K * np.log(T_K)])
+        self.Gf_data = Gf_data
+        self.Gf_coeffs = {name: np.linalg.lstsq(basis, values, rcond=None)[0] for name, values in self.Gf_data.items()}
+        self.Gf_residuals = {name: values - basis @ self.Gf_coeffs[name] for name, values in self.Gf_data.items()}
+        
+        solute, solvent = self.species
+        self.gamma_data = {
+            solute: activities[solute] / self.X_Nd_data,
+            solvent: activities[solvent] / self.X_Mg_data,
+        }
+        self.G_excess = {name: 8.314 * T_K[:, np.newaxis] * np.log(gamma) for name, gamma in self.gamma_data.items()}
+        #One compiled evaluator per (T, is_ideal), so repeated solver calls at the same temperature skip the setup
+        self.evaluator = lru_cache(maxsize=256)(self._build_evaluator)
+        self._fingerprint = None
+    
+    #The cached evaluators can't be pickled, so they are rebuilt when a database is sent to a worker process
+    #(the liquidus interpolation is left behind too and remade on first use)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['evaluator']
+        state['_liquidus_func'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.evaluator = lru_cache(maxsize=256)(self._build_evaluator)
+    
+    #Hash of all the data the model is built from, used to key cached results
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = make_key(self.temps, self.X_Nd_data, self.X_Mg_data, self.Gf_data, self.gamma_data,
+                                         *(self.liquidus or ()))
+        return self._fingerprint
+    
+    #Standard free energy of formation (J/mol) at any temperature(s) T
+    #Tabulated temperatures return the HSC value itself, so results there match the original calculations exactly
+    def Gf(self, T, name):
+        T = np.asarray(T, dtype=float)
+        T_K = T + 273.15
+        A, B, C = self.Gf_coeffs[name]
+        return A + B * T_K + C * T_K * np.log(T_K) + np.interp(T, self.temps, self.Gf_residuals[name])
+    
+    #Weights for interpolating between the two tabulated temperatures either side of T, using the end pair outside the table
+    def _temperature_weights(self, T):
+        j = np.clip(np.searchsorted(self.temps, T) - 1, 0, len(self.temps) - 2)
+        w = (T - self.temps[j]) / (self.temps[j + 1] - self.temps[j])
+        return j, w
+    
+    #gamma at data point(s) k for temperature(s) T, j and w from _temperature_weights
+    def _gamma_at_data(self, T, j, w, k, species):
+        G_excess = self.G_excess[species]
+        return np.exp(((1 - w) * G_excess[j, k] + w * G_excess[j + 1, k]) / (8.314 * (T + 273.15)))
+    
+    #Rows of gamma at the data points and its slope over X Nd at temperature(s) T
+    def gamma_table(self, T, species):
+        T = np.asarray(T, dtype=float)[..., np.newaxis]
+        j, w = self._temperature_weights(T)
+        gamma = self._gamma_at_data(T, j, w, np.arange(len(self.X_Nd_data)), species)
+        slope = np.diff(gamma, axis=-1) / np.diff(self.X_Nd_data)
+        return gamma, slope
+    
+    def _build_evaluator(self, T, is_ideal):
+        if is_ideal == 'true':
+            def evaluate(X_Nd, species):
+                return np.ones(np.shape(X_Nd))
+            return evaluate
+        
+        rows = {species: self.gamma_table(T, species) for species in self.gamma_data}
+        
+        def evaluate(X_Nd, species):
+            gamma, slope = rows[species]
+            k = np.clip(np.searchsorted(self.X_Nd_data, X_Nd) - 1, 0, len(self.X_Nd_data) - 2)
+            return gamma[k] + slope[k] * (X_Nd - self.X_Nd_data[k])
+        return evaluate
+    
+    #Activity coefficient of species ('Nd' or 'Mg', or the species of another system) at X Nd and T
+    #A single T goes through the cached evaluator, an array of T is interpolated element by element against X Nd
+    def gamma(self, T, X_Nd, species, is_ideal='false'):
+        X_Nd = np.asarray(X_Nd, dtype=float)
+        if np.ndim(T) == 0:
+            return self.evaluator(float(T), is_ideal)(X_Nd, species)
+        
+        T, X_Nd = np.broadcast_arrays(np.asarray(T, dtype=float), X_Nd)
+        if is_ideal == 'true':
+            return np.ones(X_Nd.shape)
+        j, w = self._temperature_weights(T)
+        k = np.clip(np.searchsorted(self.X_Nd_data, X_Nd) - 1, 0, len(self.X_Nd_data) - 2)
+        gamma_k = self._gamma_at_data(T, j, w, k, species)
+        gamma_k1 = self._gamma_at_data(T, j, w, k + 1, species)
+        return gamma_k + (gamma_k1 - gamma_k) * (X_Nd - self.X_Nd_data[k]) / (self.X_Nd_data[k + 1] - self.X_Nd_data[k])
+    
+    def activity(self, T, X_Nd, species, is_ideal='false'):
+        X = np.asarray(X_Nd, dtype=float) if species == self.species[0] else 1 - np.asarray(X_Nd, dtype=float)
+        return X * self.gamma(T, X_Nd, species, is_ideal)
+    
+    #Interpolation of the liquidus points with a degree 2 polynomial spline, made the first time it is needed
+    def liquidus_interp_func(self):
+        if self._liquidus_func is None:
+            from scipy.interpolate import interp1d
+            self._liquidus_func = interp1d(*liquidus_points(self), kind='quadratic', fill_value="extrapolate")
+        return self._liquidus_func
+
+#Default database built from the data module on first use, so importing the package doesn't parse any data
+_database = None
+
+def get_database():
+    global _database
+    if _database is None:
+        from . import data
+        _database = ThermoDatabase(data.thermochemical_data, data.X_Nd_a_data, data.X_Mg_a_data,
+                                   liquidus=(data.T_Mg3Nd_liquidus_data, data.X_Nd_Mg3Nd_liquidus_data))
+    return _database
+
+#Replaces the default database, e.g. with one loaded from a data store
+def set_database(db):
+    global _database
+    _database = db
+
+#(T, X Nd) liquidus points of a database
+def liquidus_points(db=None):
+    if db is None:
+        db = get_database()
+    if db.liquidus is None:
+        raise ValueError(f'the {"-".join(db.species)} database has no liquidus points, give them with liquidus=(T, X) '
+                         f'or store --liquidus')
+    return db.liquidus
+
+#Temperatures where the liquidus spline changes: the data points and the joins between its quadratic pieces,
+#halfway between data points (scipy's knots for an even degree)
+def liquidus_breaks(db=None):
+    T_data = np.sort(liquidus_points(db)[0])
+    return np.concatenate([T_data, 0.5 * (T_data[1:-2] + T_data[2:-1])])
+
+#X Nd where Mg3Nd forms as f(T), from the database's own liquidus points
+def calc_X_Nd_Mg3Nd(T, db=None):
+    if db is None:
+        db = get_database()
+    return db.liquidus_interp_func()(T)
@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .solvers import calc_eq_comp, calc_hyd_eq_comp
+from .thermo import get_database
+
+#UNCERTAINTY PROPAGATION
+#Monte Carlo sampling of the Gf values and activity data pushed through the vectorized solvers
+#Each draw adds normal noise (J/mol) to every Gf and shifts ln(gamma) of Nd and Mg by a normal amount, the same shift for all X Nd
+#The activity shifts are folded into effective Gf values, so each batch is one ordinary batched solve:
+#    reduction: RT*ln(a_Nd^2 / a_Mg^3) gains RT*(2*eps_Nd - 3*eps_Mg), i.e. Gf_NdL + RT*eps_Nd and Gf_MgO - RT*eps_Mg
+#    hydride: the target a Nd is divided by exp(eps_Nd), i.e. Gf_NdH2 - RT*eps_Nd
+#Batches are spread over a process pool, each with its own random stream, so results only depend on the seed
+
+#Standard deviations used when none are given, rough values for HSC Gf data and ThermoCalc activities; set them from the sources
+#sigmas passed to the samplers override these by name, the rest keep their defaults
+default_sigmas = {
+    'Gf_Nd2O3': 5000,
+    'Gf_MgO': 2000,
+    'Gf_NdL': 1000,
+    'Gf_NdH2': 2000,
+    'ln_gamma_Nd': 0.1,
+    'ln_gamma_Mg': 0.05,
+}
+
+batch_size = 20000
+quantiles = (0.025, 0.5, 0.975)
+
+#Normal draws of shape (n_T, n) for every perturbed input
+def _draw(rng, sigmas, n_T, n):
+    return {name: rng.normal(0, sigma, (n_T, n)) for name, sigma in sigmas.items()}
+
+def _reduction_batch(temps, sigmas, is_ideal, db, iterations, precision, n, seed):
+    rng = np.random.default_rng(seed)
+    d = _draw(rng, sigmas, len(temps), n)
+    T = temps[:, np.newaxis]
+    RT = 8.314 * (T + 273.15)
+    Gf_MgO = db.Gf(T, 'Gf_MgO') + d['Gf_MgO']
+    Gf_Nd2O3 = db.Gf(T, 'Gf_Nd2O3') + d['Gf_Nd2O3']
+    Gf_NdL = db.Gf(T, 'Gf_NdL') + d['Gf_NdL']
+    if is_ideal != 'true':
+        Gf_MgO = Gf_MgO - RT * d['ln_gamma_Mg']
+        Gf_NdL = Gf_NdL + RT * d['ln_gamma_Nd']
+    return calc_eq_comp(is_ideal, Gf_MgO, Gf_Nd2O3, Gf_NdL, T, iterations, precision, db)
+
+def _hydride_batch(temps, P_H2, sigmas, is_ideal, db, n, seed):
+    rng = np.random.default_rng(seed)
+    d = _draw(rng, sigmas, len(temps), n)
+    T = temps[:, np.newaxis]
+    RT = 8.314 * (T + 273.15)
+    Gf_NdH2 = db.Gf(T, 'Gf_NdH2') + d['Gf_NdH2']
+    Gf_NdL = db.Gf(T, 'Gf_NdL') + d['Gf_NdL']
+    if is_ideal != 'true':
+        Gf_NdH2 = Gf_NdH2 - RT * d['ln_gamma_Nd']
+    #Every (T, sample) pair is one row of the grid solver, then back to (T, P_H2, sample)
+    T_rows = np.broadcast_to(T, Gf_NdH2.shape).ravel()
+    X_Nd = calc_hyd_eq_comp(is_ideal, Gf_NdH2.ravel(), Gf_NdL.ravel(), T_rows, P_H2, db)
+    return X_Nd.reshape(len(temps), n, len(P_H2)).transpose(0, 2, 1)
+
+#Runs func(*args, n, seed) for each batch of n samples, in this process when workers=1, otherwise on a process pool
+#Returns the list of batch outputs in batch order
+def _run_batches(func, args, n_samples, seed, workers):
+    sizes = [batch_size] * (n_samples // batch_size)
+    if n_samples % batch_size:
+        sizes.append(n_samples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers == 1 or len(sizes) == 1:
+        outputs = [func(*args, n, s) for n, s in zip(sizes, seeds)]
+    else:
+        workers = min(workers or os.cpu_count() or 1, len(sizes))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(func, *args, n, s) for n, s in zip(sizes, seeds)]
+            outputs = [future.result() for future in futures]
+    return outputs
+
+#Quantile bands, mean and standard deviation over the last (sample) axis
+def _bands(samples):
+    return {
+        'quantiles': np.array(quantiles),
+        'X_Nd_quantiles': np.quantile(samples, quantiles, axis=-1),
+        'X_Nd_mean': samples.mean(axis=-1),
+        'X_Nd_std': samples.std(axis=-1),
+    }
+
+#Monte Carlo equilibrium reduction X Nd at each temperature
+#Returns confidence bands (X_Nd_quantiles has one row per entry of quantiles), the fraction of converged draws,
+#and the raw (T, sample) draws when keep_samples is set
+def sample_reduction(temps, n_samples, sigmas=None, is_ideal='false', seed=None, workers=None, iterations=100, precision=0.000001, db=None, keep_samples=False):
+    if db is None:
+        db = get_database()
+    sigmas = {**default_sigmas, **(sigmas or {})}
+    temps = np.asarray(temps, dtype=float)
+
+    outputs = _run_batches(_reduction_batch, (temps, sigmas, is_ideal, db, iterations, precision), n_samples, seed, workers)
+    samples = np.concatenate([X_Nd for X_Nd, converged in outputs], axis=-1)
+    converged = np.concatenate([converged for X_Nd, converged in outputs], axis=-1)
+
+    results = {'T': temps, 'n_samples': n_samples, 'converged_fraction': converged.mean(axis=-1), **_bands(samples)}
+    if keep_samples:
+        results['samples'] = samples
+    return results
+
+#Monte Carlo equilibrium hydriding X Nd at each (T, P_H2)
+#Keeps n_T * n_P * n_samples values in memory to get exact quantiles, so use a handful of pressures for large n_samples
+def sample_hydride(temps, P_H2, n_samples, sigmas=None, is_ideal='false', seed=None, workers=None, db=None, keep_samples=False):
+    if db is None:
+        db = get_database()
+    sigmas = {**default_sigmas, **(sigmas or {})}
+    temps = np.asarray(temps, dtype=float)
+    P_H2 = np.asarray(P_H2, dtype=float)
+
+    outputs = _run_batches(_hydride_batch, (temps, P_H2, sigmas, is_ideal, db), n_samples, seed, workers)
+    samples = np.concatenate(outputs, axis=-1)
+
+    results = {'T': temps, 'P_H2': P_H2, 'n_samples': n_samples, **_bands(samples)}
+    if keep_samples:
+        results['samples'] = samples
+    return results